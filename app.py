@@ -1,155 +1,21 @@
-import os
 import sys
-import subprocess
+import json
+import argparse
 from datetime import date
 
-VENV_DIR = "venv"
-
-def in_venv():
-    return sys.prefix != sys.base_prefix
-
-def create_venv():
-    subprocess.check_call([sys.executable, "-m", "venv", VENV_DIR])
-
-def install_deps():
-    pip_path = os.path.join(VENV_DIR, "bin", "pip")
-    subprocess.check_call([pip_path, "install", "mysql-connector-python"])
-
-def rerun_in_venv():
-    python_path = os.path.join(VENV_DIR, "bin", "python")
-    if not os.path.exists(python_path):
-        python_path = os.path.join(VENV_DIR, "Scripts", "python.exe")
-    os.execv(python_path, [python_path] + sys.argv)
-
-DB_CONFIG = {
-    "host": os.environ.get("DB_HOST", "localhost"),
-    "user": os.environ.get("DB_USER", "root"),
-    "password": os.environ.get("DB_PASS", ""),
-    "charset": "utf8mb4",
-    "collation": "utf8mb4_unicode_ci"
-}
-
-def get_connection(db_name=None):
-    import mysql.connector
-    config = DB_CONFIG.copy()
-    if db_name:
-        config["database"] = db_name
-    return mysql.connector.connect(**config)
-
-def setup_database():
-    import mysql.connector
-    from mysql.connector import Error
-    
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("CREATE DATABASE IF NOT EXISTS school")
-        cursor.close()
-        conn.close()
-        
-        conn = get_connection("school")
-        cursor = conn.cursor()
-        
-        tables = {}
-        
-        tables['classes'] = """
-        CREATE TABLE IF NOT EXISTS classes (
-            class_id INT AUTO_INCREMENT PRIMARY KEY,
-            class_name VARCHAR(10) NOT NULL,
-            section VARCHAR(10),
-            stream VARCHAR(20)
-        )
-        """
-        
-        tables['teachers'] = """
-        CREATE TABLE IF NOT EXISTS teachers (
-            teacher_id INT AUTO_INCREMENT PRIMARY KEY,
-            name VARCHAR(100) NOT NULL,
-            subject_specialization VARCHAR(50),
-            email VARCHAR(100)
-        )
-        """
-        
-        tables['subjects'] = """
-        CREATE TABLE IF NOT EXISTS subjects (
-            subject_id INT AUTO_INCREMENT PRIMARY KEY,
-            subject_name VARCHAR(50) NOT NULL,
-            teacher_id INT,
-            FOREIGN KEY (teacher_id) REFERENCES teachers(teacher_id)
-        )
-        """
-        
-        tables['students'] = """
-        CREATE TABLE IF NOT EXISTS students (
-            student_id INT AUTO_INCREMENT PRIMARY KEY,
-            name VARCHAR(100) NOT NULL,
-            dob DATE,
-            gender ENUM('Male','Female','Other'),
-            class_id INT,
-            admission_date DATE,
-            FOREIGN KEY (class_id) REFERENCES classes(class_id)
-        )
-        """
-        
-        tables['marks'] = """
-        CREATE TABLE IF NOT EXISTS marks (
-            mark_id INT AUTO_INCREMENT PRIMARY KEY,
-            student_id INT,
-            subject_id INT,
-            exam_type VARCHAR(20),
-            marks_obtained INT,
-            max_marks INT,
-            FOREIGN KEY (student_id) REFERENCES students(student_id),
-            FOREIGN KEY (subject_id) REFERENCES subjects(subject_id)
-        )
-        """
-        
-        tables['fees'] = """
-        CREATE TABLE IF NOT EXISTS fees (
-            fee_id INT AUTO_INCREMENT PRIMARY KEY,
-            student_id INT,
-            total_fee INT,
-            paid_fee INT,
-            due_fee INT,
-            last_payment_date DATE,
-            FOREIGN KEY (student_id) REFERENCES students(student_id)
-        )
-        """
-        
-        tables['attendance'] = """
-        CREATE TABLE IF NOT EXISTS attendance (
-            attendance_id INT AUTO_INCREMENT PRIMARY KEY,
-            student_id INT,
-            date DATE,
-            status ENUM('Present','Absent'),
-            UNIQUE(student_id, date),
-            FOREIGN KEY (student_id) REFERENCES students(student_id)
-        )
-        """
-        
-        for table_name, ddl in tables.items():
-            cursor.execute(ddl)
-            
-        cursor.close()
-        conn.close()
-        
-    except Error as e:
-        sys.exit(1)
+import rankings
+import rollups
+import tenants
+from bootstrap import ensure_venv
+from db import (get_connection, transaction, CountingCursor, STUDENT_COLUMNS, MARK_COLUMNS,
+                fetch_students, fetch_students_by_ids, fetch_reference, fetch_classes, fetch_student_names,
+                fetch_marks, fetch_attendance_by_student, fetch_attendance_by_date, insert_student,
+                insert_marks, insert_marks_many, upsert_attendance, normalize_status)
 
 def view_students():
     from mysql.connector import Error
     try:
-        conn = get_connection("school")
-        cursor = conn.cursor()
-        query = """
-        SELECT s.student_id, s.name, s.gender, c.class_name, c.section, c.stream
-        FROM students s
-        JOIN classes c ON s.class_id = c.class_id
-        ORDER BY s.student_id
-        """
-        cursor.execute(query)
-        rows = cursor.fetchall()
+        rows = transaction(fetch_students)
         
         print("\nStudent Records:")
         print(f"{'ID':<5} {'Name':<20} {'Gender':<10} {'Class':<10} {'Section':<10} {'Stream':<15}")
@@ -159,56 +25,38 @@ def view_students():
             sec = row[4] if row[4] else "-"
             strm = row[5] if row[5] else "-"
             print(f"{row[0]:<5} {row[1]:<20} {row[2]:<10} {cls:<10} {sec:<10} {strm:<15}")
-            
-        cursor.close()
-        conn.close()
     except Error as e:
         print(f"Error: {e}")
 
+# The menu asks its questions between transactions, so no connection (or
+# lock) is held while it waits for someone to type.
+
 def add_student():
     from mysql.connector import Error
     try:
-        conn = get_connection("school")
-        cursor = conn.cursor()
-        
         print("\nAdd New Student")
         name = input("Enter Name: ")
         dob = input("Enter DOB (YYYY-MM-DD): ")
         gender = input("Enter Gender (Male/Female/Other): ")
         
-        cursor.execute("SELECT class_id, class_name, section, stream FROM classes")
-        classes = cursor.fetchall()
-        for c in classes:
+        for c in transaction(fetch_classes):
             strm = f"({c[3]})" if c[3] else ""
             sec = f"Sec: {c[2]}" if c[2] else ""
             print(f"{c[0]}: Class {c[1]} {sec} {strm}")
             
         class_id = input("Enter Class ID: ")
-        admission_date = date.today()
-        
-        query = "INSERT INTO students (name, dob, gender, class_id, admission_date) VALUES (%s, %s, %s, %s, %s)"
-        cursor.execute(query, (name, dob, gender, class_id, admission_date))
-        conn.commit()
-        
-        cursor.close()
-        conn.close()
+        transaction(lambda cursor: insert_student(cursor, name, dob, gender, class_id))
     except Error as e:
         print(f"Error: {e}")
 
 def add_marks():
     from mysql.connector import Error
     try:
-        conn = get_connection("school")
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT student_id, name FROM students") 
-        students = cursor.fetchall()
+        _, students, subjects = transaction(fetch_reference)
         for s in students:
             print(f"{s[0]}: {s[1]}")
         student_id = input("Enter Student ID: ")
         
-        cursor.execute("SELECT subject_id, subject_name FROM subjects")
-        subjects = cursor.fetchall()
         for s in subjects:
             print(f"{s[0]}: {s[1]}")
         subject_id = input("Enter Subject ID: ")
@@ -217,102 +65,50 @@ def add_marks():
         marks = input("Enter Marks Obtained: ")
         max_marks = input("Enter Max Marks: ")
         
-        query = "INSERT INTO marks (student_id, subject_id, exam_type, marks_obtained, max_marks) VALUES (%s, %s, %s, %s, %s)"
-        cursor.execute(query, (student_id, subject_id, exam_type, marks, max_marks))
-        conn.commit()
-        
-        cursor.close()
-        conn.close()
+        transaction(lambda cursor: insert_marks(cursor, student_id, subject_id, exam_type, marks, max_marks))
     except Error as e:
         print(f"Error: {e}")
 
 def view_marks():
     from mysql.connector import Error
     try:
-        conn = get_connection("school")
-        cursor = conn.cursor()
-        
         student_id = input("Enter Student ID to view (or Press Enter for all): ")
-        
-        query = """
-        SELECT s.name, sub.subject_name, m.exam_type, m.marks_obtained, m.max_marks
-        FROM marks m
-        JOIN students s ON m.student_id = s.student_id
-        JOIN subjects sub ON m.subject_id = sub.subject_id
-        """
-        
-        if student_id:
-            query += f" WHERE m.student_id = {student_id}"
-            
-        cursor.execute(query)
-        rows = cursor.fetchall()
+        rows = transaction(lambda cursor: fetch_marks(cursor, student_id))
         
         print(f"\n{'Student':<20} {'Subject':<15} {'Exam':<10} {'Marks':<10}")
         print("-" * 60)
         for row in rows:
-            print(f"{row[0]:<20} {row[1]:<15} {row[2]:<10} {row[3]}/{row[4]}")
-            
-        cursor.close()
-        conn.close()
+            print(f"{row[1]:<20} {row[2]:<15} {row[3]:<10} {row[4]}/{row[5]}")
     except Error as e:
         print(f"Error: {e}")
 
 def mark_attendance():
     from mysql.connector import Error
     try:
-        conn = get_connection("school")
-        cursor = conn.cursor()
-        
         att_date = input(f"Enter Date (YYYY-MM-DD, default today {date.today()}): ")
         if not att_date:
             att_date = date.today()
             
-        cursor.execute("SELECT student_id, name FROM students")
-        students = cursor.fetchall()
-        
         inserts = []
-        for s in students:
+        for s in transaction(fetch_student_names):
             status = input(f"{s[1]} (ID: {s[0]}): ").upper()
             status_val = "Present" if status == 'P' else "Absent"
             inserts.append((s[0], att_date, status_val))
             
-        query = """
-        INSERT INTO attendance (student_id, date, status) 
-        VALUES (%s, %s, %s)
-        ON DUPLICATE KEY UPDATE status = VALUES(status)
-        """
-        cursor.executemany(query, inserts)
-        conn.commit()
-        
-        cursor.close()
-        conn.close()
+        transaction(lambda cursor: upsert_attendance(cursor, inserts))
     except Error as e:
         print(f"Error: {e}")
 
 def view_attendance():
     from mysql.connector import Error
     try:
-        conn = get_connection("school")
-        cursor = conn.cursor()
-        
         print("1. View by Student")
         print("2. View by Date")
         choice = input("Enter Choice: ")
         
         if choice == '1':
             sid = input("Enter Student ID (or Enter for all): ")
-            query = """
-            SELECT a.date, s.name, a.status 
-            FROM attendance a 
-            JOIN students s ON a.student_id = s.student_id
-            WHERE 1=1
-            """
-            if sid:
-                query += f" AND a.student_id = {sid}"
-            query += " ORDER BY a.date DESC LIMIT 50"
-            
-            cursor.execute(query)
-            rows = cursor.fetchall()
+            rows = transaction(lambda cursor: fetch_attendance_by_student(cursor, sid))
             print(f"\n{'Date':<12} {'Name':<20} {'Status':<10}")
             print("-" * 45)
             for row in rows:
@@ -320,40 +116,48 @@ def view_attendance():
                 
         elif choice == '2':
             dt = input("Enter Date (YYYY-MM-DD): ")
-            query = """
-            SELECT s.student_id, s.name, c.class_name, c.section, a.status
-            FROM students s
-            JOIN classes c ON s.class_id = c.class_id
-            LEFT JOIN attendance a ON s.student_id = a.student_id AND a.date = %s
-            ORDER BY c.class_name, s.name
-            """
-            cursor.execute(query, (dt,))
-            rows = cursor.fetchall()
+            rows = transaction(lambda cursor: fetch_attendance_by_date(cursor, dt))
             
             for row in rows:
                 cls = f"{row[2]}{row[3] if row[3] else ''}"
                 status = row[4] if row[4] else "N/A"
                 print(f"{row[0]:<5} {row[1]:<20} {cls:<10} {status:<10}")
+    except Error as e:
+        print(f"Error: {e}")
 
-        cursor.close()
-        conn.close()
+def view_rankings():
+    from mysql.connector import Error
+    try:
+        classes, exams = transaction(lambda cursor: (fetch_classes(cursor), rankings.exam_types(cursor)))
+        for c in classes:
+            sec = f"Sec: {c[2]}" if c[2] else ""
+            print(f"{c[0]}: Class {c[1]} {sec}")
+        class_id = input("Enter Class ID: ")
+        print("Exams: " + ", ".join(exams))
+        exam_type = input("Enter Exam Type: ")
+        limit = input("How many toppers (default 10): ")
+        
+        rows = transaction(lambda cursor: rankings.top(cursor, class_id, exam_type, int(limit) if limit else 10))
+        print(f"\n{'Rank':<6} {'Name':<20} {'Total':<12} {'Percent':<8}")
+        print("-" * 50)
+        for row in rows:
+            print(f"{row[0]:<6} {row[2]:<20} {f'{row[3]}/{row[4]}':<12} {row[6]}%")
     except Error as e:
         print(f"Error: {e}")
 
 def menu():
-    setup_database()
-    
     while True:
-        print("\nSCHOOL MANAGEMENT SYSTEM")
+        print(f"\nSCHOOL MANAGEMENT SYSTEM ({tenants.active_school()})")
         print("1. View Student Records")
         print("2. Add New Student")
         print("3. Add Marks")
         print("4. View Marks")
         print("5. Mark Daily Attendance")
         print("6. View Attendance Log")
-        print("7. Exit")
+        print("7. View Class Rankings")
+        print("8. Exit")
         
-        choice = input("\nEnter Choice (1-7): ")
+        choice = input("\nEnter Choice (1-8): ")
         
         if choice == '1':
             view_students()
@@ -368,20 +172,373 @@ def menu():
         elif choice == '6':
             view_attendance()
         elif choice == '7':
+            view_rankings()
+        elif choice == '8':
             break
 
+# Scripted commands. Each one takes an open cursor and a dict of options so the
+# same code runs from a subcommand or from one line of a batch file.
+
+def read_status_file(path):
+    statuses = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            sid, status = line.replace(",", " ").split()
+            statuses[int(sid)] = normalize_status(status)
+    return statuses
+
+def read_marks_file(path):
+    rows = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            sid, marks = line.replace(",", " ").split()
+            rows.append((int(sid), int(marks)))
+    return rows
+
+def read_ids(value):
+    return [int(x) for x in str(value).replace(",", " ").split()]
+
+def cmd_add_student(cursor, opts):
+    sid = insert_student(cursor, opts["name"], opts.get("dob"), opts.get("gender"), opts["class_id"])
+    return {"student_id": sid}
+
+def cmd_add_marks(cursor, opts):
+    max_marks = opts.get("max_marks") or 100
+    sheet = opts.get("sheet") or (read_marks_file(opts["from_file"]) if opts.get("from_file") else None)
+    if sheet:
+        # A whole mark sheet for one subject and exam goes in as one batch.
+        rows = [(sid, opts["subject_id"], opts["exam_type"], marks, max_marks) for sid, marks in sheet]
+        return {"marked": insert_marks_many(cursor, rows)}
+    if opts.get("student_id") is None or opts.get("marks") is None:
+        raise ValueError("add-marks needs --student and --marks, or --from-file")
+    mark_id = insert_marks(cursor, opts["student_id"], opts["subject_id"], opts["exam_type"],
+                           opts["marks"], max_marks)
+    return {"mark_id": mark_id}
+
+def cmd_mark_attendance(cursor, opts):
+    att_date = opts.get("date") or str(date.today())
+    default = normalize_status(opts.get("default") or "Present")
+    statuses = {int(k): normalize_status(v) for k, v in (opts.get("statuses") or {}).items()}
+    if opts.get("from_file"):
+        statuses.update(read_status_file(opts["from_file"]))
+    if opts.get("class_id"):
+        student_ids = [r[0] for r in fetch_students(cursor, opts["class_id"])]
+        for sid in student_ids:
+            statuses.setdefault(sid, default)
+        statuses = {sid: statuses[sid] for sid in student_ids}
+    rows = [(sid, att_date, status) for sid, status in statuses.items()]
+    return {"date": att_date, "marked": upsert_attendance(cursor, rows)}
+
+def cmd_view_students(cursor, opts):
+    if opts.get("ids"):
+        rows = fetch_students_by_ids(cursor, read_ids(opts["ids"]))
+    else:
+        rows = fetch_students(cursor, opts.get("class_id"))
+    return [dict(zip(STUDENT_COLUMNS, r)) for r in rows]
+
+def cmd_view_marks(cursor, opts):
+    rows = fetch_marks(cursor, opts.get("student_id"), opts.get("exam_type"))
+    return [dict(zip(MARK_COLUMNS, r)) for r in rows]
+
+def cmd_view_attendance(cursor, opts):
+    if opts.get("date"):
+        rows = fetch_attendance_by_date(cursor, opts["date"], opts.get("class_id"))
+        return [{"student_id": r[0], "name": r[1], "class": f"{r[2]}{r[3] or ''}", "status": r[4] or "N/A"} for r in rows]
+    rows = fetch_attendance_by_student(cursor, opts.get("student_id"), opts.get("limit") or 50)
+    return [{"date": r[0], "name": r[1], "status": r[2]} for r in rows]
+
+def cmd_view_rankings(cursor, opts):
+    rows = rankings.top(cursor, opts["class_id"], opts["exam_type"], opts.get("top") or 10)
+    return [dict(zip(rankings.RANKING_COLUMNS, r)) for r in rows]
+
+def cmd_rebuild_rankings(cursor, opts):
+    if opts.get("check"):
+        return {"drifted_rows": rankings.check(cursor)}
+    return {"rows": rankings.rebuild(cursor)}
+
+def cmd_attendance_report(cursor, opts):
+    end = opts.get("to") or str(date.today())
+    start = opts.get("from") or str(date.today().replace(month=1, day=1))
+    rows = rollups.trends(cursor, start, end, opts.get("class_id"), opts.get("daily"))
+    return [dict(zip(rollups.TREND_COLUMNS, r)) for r in rows]
+
+def cmd_backfill_rollups(cursor, opts):
+    return rollups.rebuild(cursor, opts.get("from"), opts.get("to"))
+
+COMMANDS = {
+    "add-student": cmd_add_student,
+    "add-marks": cmd_add_marks,
+    "mark-attendance": cmd_mark_attendance,
+    "view-students": cmd_view_students,
+    "view-marks": cmd_view_marks,
+    "view-attendance": cmd_view_attendance,
+    "view-rankings": cmd_view_rankings,
+    "rebuild-rankings": cmd_rebuild_rankings,
+    "attendance-report": cmd_attendance_report,
+    "backfill-rollups": cmd_backfill_rollups,
+}
+
+WRITE_COMMANDS = {"add-student", "add-marks", "mark-attendance", "rebuild-rankings", "backfill-rollups"}
+
+# Cross-school report: the same summary query runs against every school's
+# database at once and the rows are added up here.
+
+SCHOOL_SUMMARY = """
+SELECT (SELECT COUNT(*) FROM students), (SELECT COUNT(*) FROM teachers), (SELECT COUNT(*) FROM classes),
+       (SELECT COALESCE(SUM(paid_fee), 0) FROM fees), (SELECT COALESCE(SUM(due_fee), 0) FROM fees),
+       (SELECT COALESCE(SUM(present), 0) FROM attendance_monthly WHERE month BETWEEN %s AND %s),
+       (SELECT COALESCE(SUM(absent), 0) FROM attendance_monthly WHERE month BETWEEN %s AND %s)
+"""
+SUMMARY_COLUMNS = ("school", "students", "teachers", "classes", "fees_paid", "fees_due", "present", "absent", "rate")
+
+def school_summary(school_id, start, end):
+    conn = get_connection(school_id=school_id)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(SCHOOL_SUMMARY, (start, end, start, end))
+        row = [int(v) for v in cursor.fetchall()[0]]
+        cursor.close()
+    finally:
+        conn.close()
+    return row
+
+def summary_row(school, counts):
+    present, absent = counts[5], counts[6]
+    rate = round(100 * present / (present + absent), 1) if present + absent else 0.0
+    return dict(zip(SUMMARY_COLUMNS, [school] + counts + [rate]))
+
+def schools_report(opts):
+    # Returns (rows, errors); a school that cannot be reached is reported in
+    # errors and left out of the totals instead of failing the whole report.
+    end = rollups.as_date(opts.get("to") or date.today())
+    start = rollups.month_start(rollups.as_date(opts.get("from") or date.today().replace(month=1, day=1)))
+    ids = opts["schools"].split(",") if opts.get("schools") else None
+    results = tenants.fan_out(lambda sid: school_summary(sid, start, end), ids, opts.get("workers") or 8)
+    rows, errors, totals = [], {}, [0] * 7
+    for school, counts in results.items():
+        if isinstance(counts, Exception):
+            errors[school] = str(counts)
+            continue
+        rows.append(summary_row(school, counts))
+        totals = [t + c for t, c in zip(totals, counts)]
+    if len(rows) > 1:
+        rows.append(summary_row("ALL", totals))
+    return rows, errors
+
+def print_result(result, as_json):
+    if as_json:
+        print(json.dumps(result, default=str))
+    elif isinstance(result, list):
+        if not result:
+            return
+        cols = list(result[0].keys())
+        print("  ".join(f"{c:<15}" for c in cols))
+        print("-" * (17 * len(cols)))
+        for row in result:
+            print("  ".join(f"{str(row[c] if row[c] is not None else '-'):<15}" for c in cols))
+    else:
+        print(", ".join(f"{k}={v}" for k, v in result.items()))
+
+# A deadlock or lock wait timeout can roll back the whole open transaction,
+# not just the statement that hit it.
+TRANSACTION_LOST = {1213, 1205}
+
+def run_batch(conn, stream, commit_every):
+    # Each command runs inside a savepoint, so a failed one leaves nothing half
+    # written. Output is held back until the writes before it are committed;
+    # if the transaction is lost, every write since the last commit is
+    # reported as failed instead of ok.
+    from mysql.connector import Error
+    cursor = CountingCursor(conn.cursor())
+    held = []
+    totals = {"ok": 0, "failed": 0}
+
+    def flush(error=None):
+        if error is None and any(write and out["ok"] for out, write in held):
+            try:
+                conn.commit()
+            except Error as e:
+                conn.rollback()
+                error = e
+        for out, write in held:
+            if error is not None and write and out["ok"]:
+                out = {"line": out["line"], "ok": False, "error": f"rolled back: {error}"}
+            totals["ok" if out["ok"] else "failed"] += 1
+            sys.stdout.write(json.dumps(out, default=str) + "\n")
+        held.clear()
+
+    pending = 0
+    for lineno, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            opts = json.loads(line)
+            if not isinstance(opts, dict):
+                raise ValueError("Each line must be a JSON object")
+            name = opts.pop("cmd", None)
+            if name not in COMMANDS:
+                raise ValueError(f"Unknown command: {name}")
+        except ValueError as e:
+            held.append(({"line": lineno, "ok": False, "error": str(e)}, False))
+            continue
+        write = name in WRITE_COMMANDS
+        try:
+            cursor.execute("SAVEPOINT batch_line")
+            result = COMMANDS[name](cursor, opts)
+            held.append(({"line": lineno, "ok": True, "result": result}, write))
+            pending += write
+        except Exception as e:
+            # Any failure, including a field of the wrong type, costs only this line.
+            held.append(({"line": lineno, "ok": False, "error": str(e)}, False))
+            lost = isinstance(e, Error) and e.errno in TRANSACTION_LOST
+            if not lost:
+                try:
+                    cursor.execute("ROLLBACK TO SAVEPOINT batch_line")
+                except Error:
+                    lost = True
+            if lost:
+                conn.rollback()
+                flush(e)
+                pending = 0
+                continue
+        if pending >= commit_every or not pending:
+            flush()
+            pending = 0
+    flush()
+    cursor.close()
+    print(f"Batch finished: {totals['ok']} ok, {totals['failed']} failed, {cursor.round_trips} statements", file=sys.stderr)
+    return totals["failed"]
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="School Management System. Run without a command for the menu.")
+    parser.add_argument("--school", help="school id from tenants.json (default $SCHOOL_ID or main)")
+    sub = parser.add_subparsers(dest="command")
+
+    p = sub.add_parser("add-student", help="Add a new student")
+    p.add_argument("--name", required=True)
+    p.add_argument("--dob")
+    p.add_argument("--gender", choices=["Male", "Female", "Other"])
+    p.add_argument("--class", dest="class_id", type=int, required=True)
+
+    p = sub.add_parser("add-marks", help="Record marks for one student")
+    p.add_argument("--student", dest="student_id", type=int)
+    p.add_argument("--subject", dest="subject_id", type=int, required=True)
+    p.add_argument("--exam", dest="exam_type", required=True)
+    p.add_argument("--marks", type=int)
+    p.add_argument("--max-marks", type=int, default=100)
+    p.add_argument("--from-file", help="mark sheet, lines of 'student_id,marks', instead of --student/--marks")
+
+    p = sub.add_parser("mark-attendance", help="Mark attendance for a class or a list of students")
+    p.add_argument("--class", dest="class_id", type=int)
+    p.add_argument("--date")
+    p.add_argument("--from-file", help="lines of 'student_id,status' (P/A or Present/Absent)")
+    p.add_argument("--default", default="Present", help="status for class members not in the file")
+
+    p = sub.add_parser("view-students", help="List students")
+    p.add_argument("--class", dest="class_id", type=int)
+    p.add_argument("--ids", help="comma separated student ids, fetched in one query")
+
+    p = sub.add_parser("view-marks", help="List marks")
+    p.add_argument("--student", dest="student_id", type=int)
+    p.add_argument("--exam", dest="exam_type")
+
+    p = sub.add_parser("view-attendance", help="Attendance by date or by student")
+    p.add_argument("--date")
+    p.add_argument("--class", dest="class_id", type=int)
+    p.add_argument("--student", dest="student_id", type=int)
+    p.add_argument("--limit", type=int, default=50)
+
+    p = sub.add_parser("view-rankings", help="Toppers of a class for one exam")
+    p.add_argument("--class", dest="class_id", type=int, required=True)
+    p.add_argument("--exam", dest="exam_type", required=True)
+    p.add_argument("--top", type=int, default=10)
+
+    p = sub.add_parser("rebuild-rankings", help="Recompute the rankings table from marks")
+    p.add_argument("--check", action="store_true", help="only report rows that are out of date")
+
+    p = sub.add_parser("attendance-report", help="Present/absent totals per month (or day) over a term")
+    p.add_argument("--from", help="first date, default 1 January this year")
+    p.add_argument("--to", help="last date, default today")
+    p.add_argument("--class", dest="class_id", type=int)
+    p.add_argument("--daily", action="store_true", help="one row per day instead of per month")
+
+    p = sub.add_parser("backfill-rollups", help="Recompute attendance rollups from the attendance table")
+    p.add_argument("--from", help="only months from this date")
+    p.add_argument("--to", help="only months up to this date")
+
+    p = sub.add_parser("schools-report", help="Totals for every school, queried in parallel")
+    p.add_argument("--schools", help="comma separated school ids, default all in tenants.json")
+    p.add_argument("--from", help="attendance from this month, default January this year")
+    p.add_argument("--to", help="attendance up to this date, default today")
+    p.add_argument("--workers", type=int, default=8, help="schools queried at the same time")
+
+    p = sub.add_parser("batch", help="Run newline-delimited JSON commands from stdin")
+    p.add_argument("--commit-every", type=int, default=500)
+
+    for p in sub.choices.values():
+        p.add_argument("--json", action="store_true", help="print results as JSON")
+    return parser
+
+def main(argv):
+    from mysql.connector import Error
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        # Also checks a school picked through $SCHOOL_ID.
+        tenants.set_active_school(args.school or tenants.active_school())
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    if not args.command:
+        menu()
+        return 0
+    opts = {k: v for k, v in vars(args).items() if k not in ("command", "json", "commit_every", "school")}
+
+    if args.command == "schools-report":
+        try:
+            rows, errors = schools_report(opts)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        for school, error in errors.items():
+            print(f"Error: {school}: {error}", file=sys.stderr)
+        print_result(rows, args.json)
+        return 1 if errors else 0
+
+    try:
+        conn = get_connection(school_id=tenants.active_school())
+    except (Error, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    try:
+        if args.command == "batch":
+            return 1 if run_batch(conn, sys.stdin, max(1, args.commit_every)) else 0
+        cursor = conn.cursor()
+        result = COMMANDS[args.command](cursor, opts)
+        if args.command in WRITE_COMMANDS:
+            conn.commit()
+        cursor.close()
+        print_result(result, args.json)
+        return 0
+    except (Error, ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
 if __name__ == "__main__":
-    if not os.path.exists(VENV_DIR):
-        create_venv()
-        install_deps()
-        rerun_in_venv()
-    
-    if not in_venv():
-        rerun_in_venv()
+    ensure_venv()
 
     try:
         import mysql.connector
         from mysql.connector import Error
-        menu()
     except ImportError:
         sys.exit(1)
+    sys.exit(main(sys.argv[1:]))
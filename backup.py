@@ -0,0 +1,206 @@
+import os
+import re
+import sys
+import json
+import time
+import zipfile
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from bootstrap import ensure_venv
+from db import get_connection
+
+# Snapshot format: a zip file with one manifest.json plus the rows of every
+# table in primary-key order, split into chunks of columnar JSON
+# ({"columns": [...], "data": [[column 1 values], [column 2 values], ...]}).
+# Chunks are deflated independently, so restore can read tables in parallel.
+
+FORMAT_VERSION = 1
+SECONDARY_PREFIXES = ("UNIQUE KEY", "KEY", "INDEX", "FULLTEXT KEY", "SPATIAL KEY", "CONSTRAINT")
+
+def table_names(cursor):
+    cursor.execute("SHOW FULL TABLES WHERE Table_type = 'BASE TABLE'")
+    return [r[0] for r in cursor.fetchall()]
+
+def primary_key(cursor, db_name, table):
+    cursor.execute("""
+    SELECT COLUMN_NAME FROM information_schema.KEY_COLUMN_USAGE
+    WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND CONSTRAINT_NAME = 'PRIMARY'
+    ORDER BY ORDINAL_POSITION
+    """, (db_name, table))
+    return [r[0] for r in cursor.fetchall()]
+
+def snapshot(db_name, path, chunk_rows=20000):
+    conn = get_connection(db_name)
+    cursor = conn.cursor()
+    cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+    # Every SELECT below reads the same point in time without locking anyone out.
+    cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+    manifest = {"format": FORMAT_VERSION, "database": db_name, "created": datetime.now().isoformat(), "tables": {}}
+    try:
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+            for table in table_names(cursor):
+                cursor.execute(f"SHOW CREATE TABLE `{table}`")
+                ddl = cursor.fetchall()[0][1]
+                pk = primary_key(cursor, db_name, table)
+                order = f" ORDER BY {', '.join(f'`{c}`' for c in pk)}" if pk else ""
+                cursor.execute(f"SELECT * FROM `{table}`{order}")
+                columns = [d[0] for d in cursor.description]
+                rows = chunks = 0
+                while True:
+                    batch = cursor.fetchmany(chunk_rows)
+                    if not batch:
+                        break
+                    data = [list(col) for col in zip(*batch)]
+                    zf.writestr(f"{table}/{chunks:06d}.json", json.dumps({"columns": columns, "data": data}, default=str))
+                    rows += len(batch)
+                    chunks += 1
+                manifest["tables"][table] = {
+                    "ddl": ddl,
+                    "columns": columns,
+                    "primary_key": pk,
+                    "rows": rows,
+                    "chunks": chunks,
+                    "depends_on": sorted(set(re.findall(r"REFERENCES `([^`]+)`", ddl)) - {table}),
+                }
+            zf.writestr("manifest.json", json.dumps(manifest, indent=2))
+    finally:
+        conn.rollback()
+        conn.close()
+    return manifest
+
+def split_ddl(ddl):
+    # Keep columns and the primary key for the load; secondary indexes and
+    # foreign keys are added afterwards in one ALTER per table.
+    lines = ddl.split("\n")
+    body, deferred = [], []
+    for line in lines[1:-1]:
+        item = line.strip().rstrip(",")
+        if item.startswith(SECONDARY_PREFIXES):
+            deferred.append(item)
+        else:
+            body.append("  " + item)
+    return lines[0] + "\n" + ",\n".join(body) + "\n" + lines[-1], deferred
+
+def load_waves(tables):
+    # Group tables so every table comes after the tables it references.
+    waves, placed = [], set()
+    remaining = dict(tables)
+    while remaining:
+        wave = [t for t, info in remaining.items() if all(d in placed or d not in tables for d in info["depends_on"])]
+        if not wave:
+            wave = list(remaining)
+        waves.append(sorted(wave))
+        placed.update(wave)
+        for t in wave:
+            del remaining[t]
+    return waves
+
+def open_session(db_name):
+    conn = get_connection(db_name)
+    cursor = conn.cursor()
+    cursor.execute("SET SESSION foreign_key_checks = 0")
+    cursor.execute("SET SESSION unique_checks = 0")
+    return conn, cursor
+
+def load_table(path, db_name, table, info, batch_rows):
+    conn, cursor = open_session(db_name)
+    cols = ", ".join(f"`{c}`" for c in info["columns"])
+    marks = ", ".join(["%s"] * len(info["columns"]))
+    query = f"INSERT INTO `{table}` ({cols}) VALUES ({marks})"
+    try:
+        with zipfile.ZipFile(path) as zf:
+            for i in range(info["chunks"]):
+                chunk = json.loads(zf.read(f"{table}/{i:06d}.json"))
+                rows = list(zip(*chunk["data"]))
+                for j in range(0, len(rows), batch_rows):
+                    cursor.executemany(query, rows[j:j + batch_rows])
+                conn.commit()
+    finally:
+        conn.close()
+    return table
+
+def add_indexes(db_name, table, deferred):
+    if not deferred:
+        return table
+    conn, cursor = open_session(db_name)
+    try:
+        cursor.execute(f"ALTER TABLE `{table}` " + ", ".join(f"ADD {d}" for d in deferred))
+    finally:
+        conn.close()
+    return table
+
+def restore(path, db_name, jobs=4, replace=False, batch_rows=2000):
+    with zipfile.ZipFile(path) as zf:
+        manifest = json.loads(zf.read("manifest.json"))
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format')}")
+    tables = manifest["tables"]
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}`")
+    cursor.execute(f"USE `{db_name}`")
+    existing = [t for t in table_names(cursor) if t in tables]
+    if existing and not replace:
+        conn.close()
+        raise ValueError(f"{db_name} already has tables {', '.join(existing)}; use --replace to drop them")
+    cursor.execute("SET SESSION foreign_key_checks = 0")
+    for t in existing:
+        cursor.execute(f"DROP TABLE `{t}`")
+    deferred = {}
+    for table, info in tables.items():
+        ddl, deferred[table] = split_ddl(info["ddl"])
+        cursor.execute(ddl)
+    conn.close()
+
+    timings = {}
+    waves = load_waves(tables)
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        start = time.perf_counter()
+        for wave in waves:
+            list(pool.map(lambda t: load_table(path, db_name, t, tables[t], batch_rows), wave))
+        timings["load_seconds"] = time.perf_counter() - start
+        start = time.perf_counter()
+        for wave in waves:
+            list(pool.map(lambda t: add_indexes(db_name, t, deferred[t]), wave))
+        timings["index_seconds"] = time.perf_counter() - start
+    timings["rows"] = sum(info["rows"] for info in tables.values())
+    return timings
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Snapshot backup and parallel restore of the school database")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("snapshot", help="write a consistent snapshot of every table")
+    p.add_argument("--database", default="school")
+    p.add_argument("--out", default=f"school-{datetime.now():%Y%m%d-%H%M%S}.snap")
+    p.add_argument("--chunk-rows", type=int, default=20000)
+    p = sub.add_parser("restore", help="load a snapshot into a database")
+    p.add_argument("snapshot")
+    p.add_argument("--database", default="school")
+    p.add_argument("--jobs", type=int, default=4, help="tables loaded at the same time")
+    p.add_argument("--replace", action="store_true", help="drop tables that already exist in the target")
+    args = parser.parse_args(argv)
+
+    from mysql.connector import Error
+    try:
+        start = time.perf_counter()
+        if args.command == "snapshot":
+            manifest = snapshot(args.database, args.out, args.chunk_rows)
+            rows = sum(t["rows"] for t in manifest["tables"].values())
+            size = os.path.getsize(args.out)
+            print(f"Wrote {rows} rows from {len(manifest['tables'])} tables to {args.out} "
+                  f"({size / 2**20:.1f} MiB) in {time.perf_counter() - start:.1f}s")
+        else:
+            timings = restore(args.snapshot, args.database, max(1, args.jobs), args.replace)
+            print(f"Restored {timings['rows']} rows into {args.database} in {time.perf_counter() - start:.1f}s "
+                  f"(load {timings['load_seconds']:.1f}s, indexes {timings['index_seconds']:.1f}s)")
+    except (Error, ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    ensure_venv()
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backup
+import rankings
+from db import get_connection, setup_database
+
+# Builds synthetic schools of growing size, then times a snapshot and a
+# restore of each. Throughput (rows/s) staying flat as the school grows means
+# backup and restore time scale linearly. Needs a local MySQL server; it only
+# touches databases named school_bench_*.
+
+def insert_chunks(cursor, query, rows, size=5000):
+    for i in range(0, len(rows), size):
+        cursor.executemany(query, rows[i:i + size])
+
+def build_school(db_name, n_students, days, exams=("Midterm", "Final")):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{db_name}`")
+    conn.close()
+    setup_database(db_name)
+
+    rng = random.Random(n_students)
+    conn = get_connection(db_name)
+    cursor = conn.cursor()
+    cursor.execute("SET SESSION foreign_key_checks = 0")
+    n_classes = max(1, n_students // 40)
+    insert_chunks(cursor, "INSERT INTO teachers (teacher_id, name, subject_specialization, email) VALUES (%s, %s, %s, %s)",
+                  [(i, f"Teacher {i}", f"Subject {i % 10 + 1}", f"t{i}@school.test") for i in range(1, 31)])
+    insert_chunks(cursor, "INSERT INTO subjects (subject_id, subject_name, teacher_id) VALUES (%s, %s, %s)",
+                  [(i, f"Subject {i}", i) for i in range(1, 11)])
+    insert_chunks(cursor, "INSERT INTO classes (class_id, class_name, section, stream) VALUES (%s, %s, %s, %s)",
+                  [(i, str(6 + i % 7), "ABCD"[i % 4], None) for i in range(1, n_classes + 1)])
+    insert_chunks(cursor, "INSERT INTO students (student_id, name, dob, gender, class_id, admission_date) VALUES (%s, %s, %s, %s, %s, %s)",
+                  [(i, f"Student {i}", date(2010, 1, 1) + timedelta(days=i % 1500), rng.choice(["Male", "Female"]),
+                    rng.randrange(1, n_classes + 1), date(2024, 4, 1)) for i in range(1, n_students + 1)])
+    paid = [rng.randrange(0, 50001, 500) for _ in range(n_students)]
+    insert_chunks(cursor, "INSERT INTO fees (student_id, total_fee, paid_fee, due_fee, last_payment_date) VALUES (%s, %s, %s, %s, %s)",
+                  [(i + 1, 50000, p, 50000 - p, date(2024, 6, 1)) for i, p in enumerate(paid)])
+    insert_chunks(cursor, "INSERT INTO marks (student_id, subject_id, exam_type, marks_obtained, max_marks) VALUES (%s, %s, %s, %s, %s)",
+                  [(i, sub, exam, rng.randrange(20, 101), 100) for i in range(1, n_students + 1) for sub in range(1, 11) for exam in exams])
+    start_day = date(2024, 6, 1)
+    insert_chunks(cursor, "INSERT INTO attendance (student_id, date, status) VALUES (%s, %s, %s)",
+                  [(i, start_day + timedelta(days=d), "Absent" if rng.random() < 0.08 else "Present")
+                   for d in range(days) for i in range(1, n_students + 1)])
+    rankings.rebuild(cursor)
+    conn.commit()
+    conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark snapshot and restore on synthetic schools")
+    parser.add_argument("--sizes", default="1000,2000,4000,8000", help="comma separated student counts")
+    parser.add_argument("--days", type=int, default=30, help="days of attendance per student")
+    parser.add_argument("--jobs", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'students':>8} {'rows':>10} {'file MiB':>9} {'backup s':>9} {'rows/s':>9} {'restore s':>10} {'rows/s':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in [int(x) for x in args.sizes.split(",")]:
+            source, target = f"school_bench_{n}", f"school_bench_{n}_restore"
+            build_school(source, n, args.days)
+            path = os.path.join(tmp, f"{source}.snap")
+
+            start = time.perf_counter()
+            manifest = backup.snapshot(source, path)
+            backup_s = time.perf_counter() - start
+            rows = sum(t["rows"] for t in manifest["tables"].values())
+
+            start = time.perf_counter()
+            backup.restore(path, target, jobs=args.jobs, replace=True)
+            restore_s = time.perf_counter() - start
+
+            print(f"{n:>8} {rows:>10} {os.path.getsize(path) / 2**20:>9.1f} {backup_s:>9.2f} {rows / backup_s:>9.0f}"
+                  f" {restore_s:>10.2f} {rows / restore_s:>9.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from roster import Roster
+
+# Compares the memory and load time of the shared Roster against what the GUI
+# used to hold: separate tuple lists per tab, each with its own copy of the
+# class strings (the connector hands back a new str object for every cell).
+
+def make_rows(n_students, n_classes):
+    rng = random.Random(42)
+    classes = []
+    for cid in range(1, n_classes + 1):
+        classes.append((cid, str(6 + cid % 7), "ABCD"[cid % 4], rng.choice([None, "Science", "Commerce", "Arts"])))
+    students = []
+    for sid in range(1, n_students + 1):
+        name = f"Student {rng.randrange(10**6):06d} {sid}"
+        students.append((sid, name, rng.choice(["Male", "Female", "Other"]), rng.randrange(1, n_classes + 1)))
+    subjects = [(i, f"Subject {i}") for i in range(1, 21)]
+    return classes, students, subjects
+
+def fresh(value):
+    # Copy a string the way a DB driver would decode it: a new object per cell.
+    return "".join(list(value)) if isinstance(value, str) else value
+
+def load_tuples(classes, students, subjects):
+    cls = {c[0]: c for c in classes}
+    students_tab = [(s[0], fresh(s[1]), fresh(s[2])) + tuple(fresh(x) for x in cls[s[3]][1:]) for s in students]
+    attendance_tab = [(s[0], fresh(s[1]), fresh(cls[s[3]][1])) for s in students]
+    marks_picker = {f"{s[1]} (ID: {s[0]})": s[0] for s in students}
+    subject_picker = {fresh(name): subid for subid, name in subjects}
+    return students_tab, attendance_tab, marks_picker, subject_picker
+
+def load_roster(classes, students, subjects):
+    roster = Roster()
+    roster.load_rows(classes, [(s[0], fresh(s[1]), fresh(s[2]), s[3]) for s in students], subjects)
+    return roster
+
+def load_snapshot(path):
+    roster = Roster()
+    roster.load_file(path)
+    return roster
+
+def measure(label, fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<22} load {elapsed * 1000:8.1f} ms   retained {current / 2**20:7.2f} MiB   peak {peak / 2**20:7.2f} MiB")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the shared roster model")
+    parser.add_argument("--students", type=int, default=50000)
+    parser.add_argument("--classes", type=int, default=40)
+    args = parser.parse_args()
+
+    classes, students, subjects = make_rows(args.students, args.classes)
+    print(f"{args.students} students, {args.classes} classes")
+    measure("per-tab tuples", load_tuples, classes, students, subjects)
+    roster = measure("shared roster", load_roster, classes, students, subjects)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "roster.bin")
+        roster.save_file(path, {})
+        measure("roster from snapshot", load_snapshot, path)
+        # tracemalloc slows every allocation down; time the warm start without it.
+        start = time.perf_counter()
+        load_snapshot(path)
+        print(f"{'snapshot untraced':<22} load {(time.perf_counter() - start) * 1000:8.1f} ms   "
+              f"file {os.path.getsize(path) / 2**20:7.2f} MiB")
+
+    start = time.perf_counter()
+    roster.student_choices()
+    roster.students_by_class()
+    print(f"{'roster pickers':<22} build {(time.perf_counter() - start) * 1000:7.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import os
+import sys
+import subprocess
+
+# The scripts install their own dependencies: the first run makes ./venv,
+# installs the MySQL connector into it and starts itself again from there.
+
+VENV_DIR = "venv"
+
+def in_venv():
+    return sys.prefix != sys.base_prefix
+
+def create_venv():
+    subprocess.check_call([sys.executable, "-m", "venv", VENV_DIR])
+
+def install_deps():
+    pip_path = os.path.join(VENV_DIR, "bin", "pip")
+    subprocess.check_call([pip_path, "install", "mysql-connector-python"])
+
+def rerun_in_venv():
+    python_path = os.path.join(VENV_DIR, "bin", "python")
+    if not os.path.exists(python_path):
+        python_path = os.path.join(VENV_DIR, "Scripts", "python.exe")
+    os.execv(python_path, [python_path] + sys.argv)
+
+def ensure_venv():
+    if not os.path.exists(VENV_DIR):
+        create_venv()
+        install_deps()
+        rerun_in_venv()
+    if not in_venv():
+        rerun_in_venv()
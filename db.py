@@ -0,0 +1,320 @@
+import os
+import re
+import sys
+import threading
+from datetime import date
+
+import tenants
+import rankings
+import rollups
+import listing
+
+# Everything app.py and gui_app.py say to MySQL: connections, the schema and
+# the queries. Helpers take a cursor so several of them can share one
+# transaction, and the batch ones take lists so a whole class or a whole mark
+# sheet costs the same number of round trips as a single student.
+
+DB_CONFIG = {
+    "host": os.environ.get("DB_HOST", "localhost"),
+    "user": os.environ.get("DB_USER", "root"),
+    "password": os.environ.get("DB_PASS", ""),
+    "charset": "utf8mb4",
+    "collation": "utf8mb4_unicode_ci"
+}
+
+TABLES = {
+    'classes': """CREATE TABLE IF NOT EXISTS classes (
+        class_id INT AUTO_INCREMENT PRIMARY KEY,
+        class_name VARCHAR(10) NOT NULL,
+        section VARCHAR(10),
+        stream VARCHAR(20)
+    )""",
+    'teachers': """CREATE TABLE IF NOT EXISTS teachers (
+        teacher_id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        subject_specialization VARCHAR(50),
+        email VARCHAR(100)
+    )""",
+    'subjects': """CREATE TABLE IF NOT EXISTS subjects (
+        subject_id INT AUTO_INCREMENT PRIMARY KEY,
+        subject_name VARCHAR(50) NOT NULL,
+        teacher_id INT,
+        FOREIGN KEY (teacher_id) REFERENCES teachers(teacher_id)
+    )""",
+    'students': """CREATE TABLE IF NOT EXISTS students (
+        student_id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        dob DATE,
+        gender ENUM('Male','Female','Other'),
+        class_id INT,
+        admission_date DATE,
+        FOREIGN KEY (class_id) REFERENCES classes(class_id)
+    )""",
+    'marks': """CREATE TABLE IF NOT EXISTS marks (
+        mark_id INT AUTO_INCREMENT PRIMARY KEY,
+        student_id INT,
+        subject_id INT,
+        exam_type VARCHAR(20),
+        marks_obtained INT,
+        max_marks INT,
+        FOREIGN KEY (student_id) REFERENCES students(student_id),
+        FOREIGN KEY (subject_id) REFERENCES subjects(subject_id)
+    )""",
+    'fees': """CREATE TABLE IF NOT EXISTS fees (
+        fee_id INT AUTO_INCREMENT PRIMARY KEY,
+        student_id INT,
+        total_fee INT,
+        paid_fee INT,
+        due_fee INT,
+        last_payment_date DATE,
+        FOREIGN KEY (student_id) REFERENCES students(student_id)
+    )""",
+    'attendance': """CREATE TABLE IF NOT EXISTS attendance (
+        attendance_id INT AUTO_INCREMENT PRIMARY KEY,
+        student_id INT,
+        date DATE,
+        status ENUM('Present','Absent'),
+        UNIQUE(student_id, date),
+        FOREIGN KEY (student_id) REFERENCES students(student_id)
+    )"""
+}
+
+def get_connection(db_name=None, school_id=None):
+    # With a school_id the connection comes from that school's pool, on its
+    # own database (and server, if tenants.json says so).
+    import mysql.connector
+    if school_id is not None:
+        return tenants.connect(DB_CONFIG, school_id, provision_school)
+    config = DB_CONFIG.copy()
+    if db_name:
+        config["database"] = db_name
+    return mysql.connector.connect(**config)
+
+def provision_school(db_name, server):
+    setup_database(db_name, server, raise_errors=True)
+
+def setup_database(db_name="school", server=None, raise_errors=False):
+    import mysql.connector
+    from mysql.connector import Error
+    server = server or DB_CONFIG
+    try:
+        conn = mysql.connector.connect(**server)
+        cursor = conn.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}`")
+        cursor.close()
+        conn.close()
+
+        conn = mysql.connector.connect(database=db_name, **server)
+        cursor = conn.cursor()
+        for table_name, ddl in TABLES.items():
+            cursor.execute(ddl)
+        rankings.ensure_table(cursor)
+        rollups.ensure_tables(cursor)
+        listing.ensure_indexes(cursor)
+        conn.commit()
+        cursor.close()
+        conn.close()
+    except Error as e:
+        if raise_errors:
+            raise
+        sys.exit(1)
+
+# Round trips. The connector folds an executemany of INSERT ... VALUES (%s, ...)
+# into one multi-row statement; anything else is sent once per row.
+
+BATCHED = re.compile(r"^\s*(INSERT|REPLACE)\b.*\bVALUES\s*\(\s*%s", re.I | re.S)
+
+class CountingCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.round_trips = 0
+
+    def execute(self, query, params=()):
+        self.round_trips += 1
+        return self.cursor.execute(query, params)
+
+    def executemany(self, query, rows):
+        rows = list(rows)
+        self.round_trips += 1 if BATCHED.match(query) else len(rows)
+        return self.cursor.executemany(query, rows)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+counts = threading.local()
+
+def last_round_trips():
+    # Statements plus the commit of the last transaction() on this thread.
+    return getattr(counts, "round_trips", 0)
+
+def transaction(work, school_id=None):
+    conn = get_connection(school_id=school_id or tenants.active_school())
+    cursor = CountingCursor(conn.cursor())
+    try:
+        result = work(cursor)
+        conn.commit()
+        cursor.round_trips += 1
+        return result
+    finally:
+        counts.round_trips = cursor.round_trips
+        conn.close()
+
+def placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+# Reads
+
+STUDENT_COLUMNS = ("student_id", "name", "gender", "class_name", "section", "stream")
+MARK_COLUMNS = ("student_id", "name", "subject_name", "exam_type", "marks_obtained", "max_marks")
+
+STUDENTS_QUERY = """
+SELECT s.student_id, s.name, s.gender, c.class_name, c.section, c.stream
+FROM students s
+JOIN classes c ON s.class_id = c.class_id
+"""
+
+REFERENCE_QUERY = """
+SELECT 1, class_id, class_name, section, stream FROM classes
+UNION ALL SELECT 2, student_id, name, gender, class_id FROM students
+UNION ALL SELECT 3, subject_id, subject_name, NULL, NULL FROM subjects
+ORDER BY 1, 2
+"""
+
+def fetch_students(cursor, class_id=None):
+    query = STUDENTS_QUERY
+    params = ()
+    if class_id:
+        query += " WHERE s.class_id = %s"
+        params = (class_id,)
+    query += " ORDER BY s.student_id"
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+def fetch_students_by_ids(cursor, student_ids):
+    ids = sorted({int(sid) for sid in student_ids})
+    if not ids:
+        return []
+    cursor.execute(STUDENTS_QUERY + f" WHERE s.student_id IN ({placeholders(ids)}) ORDER BY s.student_id", ids)
+    return cursor.fetchall()
+
+def fetch_reference(cursor):
+    # Classes, students and subjects in one round trip. The UNION widens the
+    # last column to text, so a student's class id comes back as a string.
+    cursor.execute(REFERENCE_QUERY)
+    classes, students, subjects = [], [], []
+    for kind, key, a, b, c in cursor.fetchall():
+        if kind == 1:
+            classes.append((key, a, b, c))
+        elif kind == 2:
+            students.append((key, a, b, int(c) if c is not None else None))
+        else:
+            subjects.append((key, a))
+    return classes, students, subjects
+
+def fetch_classes(cursor):
+    cursor.execute("SELECT class_id, class_name, section, stream FROM classes ORDER BY class_id")
+    return cursor.fetchall()
+
+def fetch_student_names(cursor):
+    cursor.execute("SELECT student_id, name FROM students ORDER BY student_id")
+    return cursor.fetchall()
+
+def fetch_marks(cursor, student_id=None, exam_type=None):
+    query = """
+    SELECT s.student_id, s.name, sub.subject_name, m.exam_type, m.marks_obtained, m.max_marks
+    FROM marks m
+    JOIN students s ON m.student_id = s.student_id
+    JOIN subjects sub ON m.subject_id = sub.subject_id
+    WHERE 1=1
+    """
+    params = []
+    if student_id:
+        query += " AND m.student_id = %s"
+        params.append(student_id)
+    if exam_type:
+        query += " AND m.exam_type = %s"
+        params.append(exam_type)
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+def fetch_attendance_by_student(cursor, student_id=None, limit=50):
+    query = """
+    SELECT a.date, s.name, a.status
+    FROM attendance a
+    JOIN students s ON a.student_id = s.student_id
+    WHERE 1=1
+    """
+    params = []
+    if student_id:
+        query += " AND a.student_id = %s"
+        params.append(student_id)
+    query += " ORDER BY a.date DESC LIMIT %s"
+    params.append(limit)
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+def fetch_attendance_by_date(cursor, att_date, class_id=None):
+    query = """
+    SELECT s.student_id, s.name, c.class_name, c.section, a.status
+    FROM students s
+    JOIN classes c ON s.class_id = c.class_id
+    LEFT JOIN attendance a ON s.student_id = a.student_id AND a.date = %s
+    """
+    params = [att_date]
+    if class_id:
+        query += " WHERE s.class_id = %s"
+        params.append(class_id)
+    query += " ORDER BY c.class_name, s.name"
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+def fetch_statuses(cursor, att_date):
+    cursor.execute("SELECT student_id, status FROM attendance WHERE date = %s", (att_date,))
+    return dict(cursor.fetchall())
+
+# Writes
+
+def insert_student(cursor, name, dob, gender, class_id):
+    query = "INSERT INTO students (name, dob, gender, class_id, admission_date) VALUES (%s, %s, %s, %s, %s)"
+    cursor.execute(query, (name, dob, gender, class_id, date.today()))
+    return cursor.lastrowid
+
+def insert_teacher(cursor, name, subject, email):
+    cursor.execute("INSERT INTO teachers (name, subject_specialization, email) VALUES (%s, %s, %s)", (name, subject, email))
+    return cursor.lastrowid
+
+def insert_marks(cursor, student_id, subject_id, exam_type, marks, max_marks):
+    return rankings.record_marks(cursor, student_id, subject_id, exam_type, marks, max_marks)
+
+def insert_marks_many(cursor, rows):
+    # rows: (student_id, subject_id, exam_type, marks, max_marks)
+    return rankings.record_marks_many(cursor, rows)
+
+def upsert_attendance(cursor, rows):
+    return rollups.record_attendance(cursor, rows)
+
+def pay_fee(cursor, fee_id, amount):
+    # Added in SQL rather than read, added and written back, so two clerks
+    # taking payments for the same student can't overwrite each other.
+    cursor.execute("UPDATE fees SET paid_fee = paid_fee + %s, due_fee = due_fee - %s, last_payment_date = %s WHERE fee_id = %s",
+                   (amount, amount, date.today(), fee_id))
+
+def delete_students(cursor, student_ids):
+    # One transaction and a fixed number of statements however many are selected.
+    ids = sorted({int(sid) for sid in student_ids})
+    if not ids:
+        return 0
+    rankings.forget_students(cursor, ids)
+    rollups.forget_students(cursor, ids)
+    marks = placeholders(ids)
+    for table in ("marks", "attendance", "fees", "students"):
+        cursor.execute(f"DELETE FROM {table} WHERE student_id IN ({marks})", ids)
+    return cursor.rowcount
+
+def normalize_status(value):
+    status = str(value).strip().capitalize()
+    if status in ("P", "Present"):
+        return "Present"
+    if status in ("A", "Absent"):
+        return "Absent"
+    raise ValueError(f"Unknown attendance status: {value}")
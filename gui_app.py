@@ -1,119 +1,26 @@
 import os
 import sys
-import subprocess
+import time
+import queue
+import argparse
+import threading
 from datetime import date
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 
-VENV_DIR = "venv"
-
-def in_venv():
-    return sys.prefix != sys.base_prefix
-
-def create_venv():
-    subprocess.check_call([sys.executable, "-m", "venv", VENV_DIR])
-
-def install_deps():
-    pip_path = os.path.join(VENV_DIR, "bin", "pip")
-    subprocess.check_call([pip_path, "install", "mysql-connector-python"])
-
-def rerun_in_venv():
-    python_path = os.path.join(VENV_DIR, "bin", "python")
-    if not os.path.exists(python_path):
-        python_path = os.path.join(VENV_DIR, "Scripts", "python.exe")
-    os.execv(python_path, [python_path] + sys.argv)
-
-DB_CONFIG = {
-    "host": os.environ.get("DB_HOST", "localhost"),
-    "user": os.environ.get("DB_USER", "root"),
-    "password": os.environ.get("DB_PASS", ""),
-    "charset": "utf8mb4",
-    "collation": "utf8mb4_unicode_ci"
-}
-
-def get_connection(db_name=None):
-    import mysql.connector
-    config = DB_CONFIG.copy()
-    if db_name:
-        config["database"] = db_name
-    return mysql.connector.connect(**config)
-
-def setup_database():
-    import mysql.connector
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("CREATE DATABASE IF NOT EXISTS school")
-        cursor.close()
-        conn.close()
-        
-        conn = get_connection("school")
-        cursor = conn.cursor()
-        
-        tables = {
-            'classes': """CREATE TABLE IF NOT EXISTS classes (
-                class_id INT AUTO_INCREMENT PRIMARY KEY,
-                class_name VARCHAR(10) NOT NULL,
-                section VARCHAR(10),
-                stream VARCHAR(20)
-            )""",
-            'teachers': """CREATE TABLE IF NOT EXISTS teachers (
-                teacher_id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(100) NOT NULL,
-                subject_specialization VARCHAR(50),
-                email VARCHAR(100)
-            )""",
-            'subjects': """CREATE TABLE IF NOT EXISTS subjects (
-                subject_id INT AUTO_INCREMENT PRIMARY KEY,
-                subject_name VARCHAR(50) NOT NULL,
-                teacher_id INT,
-                FOREIGN KEY (teacher_id) REFERENCES teachers(teacher_id)
-            )""",
-            'students': """CREATE TABLE IF NOT EXISTS students (
-                student_id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(100) NOT NULL,
-                dob DATE,
-                gender ENUM('Male','Female','Other'),
-                class_id INT,
-                admission_date DATE,
-                FOREIGN KEY (class_id) REFERENCES classes(class_id)
-            )""",
-            'marks': """CREATE TABLE IF NOT EXISTS marks (
-                mark_id INT AUTO_INCREMENT PRIMARY KEY,
-                student_id INT,
-                subject_id INT,
-                exam_type VARCHAR(20),
-                marks_obtained INT,
-                max_marks INT,
-                FOREIGN KEY (student_id) REFERENCES students(student_id),
-                FOREIGN KEY (subject_id) REFERENCES subjects(subject_id)
-            )""",
-            'fees': """CREATE TABLE IF NOT EXISTS fees (
-                fee_id INT AUTO_INCREMENT PRIMARY KEY,
-                student_id INT,
-                total_fee INT,
-                paid_fee INT,
-                due_fee INT,
-                last_payment_date DATE,
-                FOREIGN KEY (student_id) REFERENCES students(student_id)
-            )""",
-            'attendance': """CREATE TABLE IF NOT EXISTS attendance (
-                attendance_id INT AUTO_INCREMENT PRIMARY KEY,
-                student_id INT,
-                date DATE,
-                status ENUM('Present','Absent'),
-                UNIQUE(student_id, date),
-                FOREIGN KEY (student_id) REFERENCES students(student_id)
-            )"""
-        }
-        
-        for table_name, ddl in tables.items():
-            cursor.execute(ddl)
-            
-        cursor.close()
-        conn.close()
-    except Exception as e:
-        sys.exit(1)
+import db
+import rankings
+import rollups
+import tenants
+from bootstrap import ensure_venv
+from db import transaction, last_round_trips
+from listing import ListSpec, build_query, allowed_sorts
+from roster import Roster, GENDERS, watermark
+
+STARTED = time.perf_counter()
+
+def diag(event):
+    print(f"[diag] {event}: {(time.perf_counter() - STARTED) * 1000:.0f} ms", file=sys.stderr)
 
 class ModernTheme:
     BG_COLOR = "#f0f0f0"
@@ -139,13 +46,152 @@ class ModernTheme:
         style.configure("TLabel", background=ModernTheme.BG_COLOR, font=("Helvetica", 11))
         style.configure("Header.TLabel", font=("Helvetica", 16, "bold"), foreground=ModernTheme.HEADER_BG)
 
+DASHBOARD_QUERY = "SELECT (SELECT COUNT(*) FROM students), (SELECT COUNT(*) FROM teachers), (SELECT COUNT(*) FROM classes)"
+STUDENTS_LIST = ListSpec(
+    select="s.student_id, s.name, s.gender, s.class_id",
+    source="FROM students s",
+    key="s.student_id",
+    sorts={"ID": "s.student_id", "Name": "s.name"},
+    filters={"class": "s.class_id = %s", "gender": "s.gender = %s"},
+)
+TEACHERS_LIST = ListSpec(
+    select="teacher_id, name, subject_specialization, email",
+    source="FROM teachers",
+    key="teacher_id",
+    sorts={"ID": "teacher_id", "Name": "name", "Subject": "subject_specialization"},
+)
+MARKS_LIST = ListSpec(
+    select="s.name, CONCAT(c.class_name, c.section), sub.subject_name, m.exam_type, m.marks_obtained, m.max_marks",
+    source="""FROM marks m
+    JOIN students s ON m.student_id = s.student_id
+    JOIN classes c ON s.class_id = c.class_id
+    JOIN subjects sub ON m.subject_id = sub.subject_id""",
+    key="m.mark_id",
+    sorts={"Exam": "m.exam_type", "Marks": "m.marks_obtained"},
+    filters={"class": "s.class_id = %s", "subject": "m.subject_id = %s", "exam": "m.exam_type = %s"},
+    default_desc=True,
+    hints={"class": "JOIN_ORDER(s, m)"},
+)
+FEES_LIST = ListSpec(
+    select="f.fee_id, s.name, f.total_fee, f.paid_fee, f.due_fee, f.last_payment_date",
+    source="FROM fees f JOIN students s ON f.student_id = s.student_id",
+    key="f.fee_id",
+    sorts={"ID": "f.fee_id", "Paid": "f.paid_fee", "Due": "f.due_fee", "Last Payment": "f.last_payment_date"},
+    filters={"class": "s.class_id = %s", "dues": "f.due_fee > 0"},
+    # due_fee > 0 is a range, so only the due_fee index can also give the order.
+    filter_sorts={"dues": ("Due",)},
+    hints={"class": "JOIN_ORDER(s, f)"},
+)
+
+CACHE_DIR = os.environ.get("SCHOOL_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+
+# Background prefetch order after the visible tab: the roster first since the
+# Students, Attendance and Rankings tabs and all the pickers need it.
+PREFETCH_ORDER = ("dashboard", "trends", "roster", "students", "marks", "fees", "teachers", "exams")
+
+class ServerList:
+    # A Treeview that shows one page at a time of a ListSpec query, with
+    # clickable headings for sorting and a Load More button for the next page.
+    PAGE_SIZE = 200
+
+    def __init__(self, app, parent, spec, columns, format_row=tuple, width=None):
+        self.app = app
+        self.spec = spec
+        self.columns = columns
+        self.format_row = format_row
+        self.filters = {}
+        self.sort = spec.default_sort
+        self.desc = spec.default_desc
+        self.after = None
+        self.tree = ttk.Treeview(parent, columns=columns, show='headings')
+        for col in columns:
+            if col in spec.sorts:
+                self.tree.heading(col, text=col, command=lambda c=col: self.sort_by(c))
+            else:
+                self.tree.heading(col, text=col)
+            if width: self.tree.column(col, width=width)
+        self.tree.pack(fill='both', expand=True, padx=10, pady=(10, 0))
+        footer = ttk.Frame(parent, padding=(10, 5))
+        footer.pack(fill='x')
+        self.lbl_count = ttk.Label(footer, text="")
+        self.lbl_count.pack(side='left')
+        self.btn_more = ttk.Button(footer, text="Load More", command=self.load_more, state='disabled')
+        self.btn_more.pack(side='left', padx=5)
+
+    def page_query(self, after=None):
+        # One extra row tells us whether there is another page.
+        return build_query(self.spec, self.filters, self.sort, self.desc, after, self.PAGE_SIZE + 1)
+
+    def fetch_page(self):
+        # Runs on the prefetch thread; the query goes back with the rows so a
+        # page fetched before the filters or sort changed can be told apart.
+        query = self.page_query()
+        return query, self.app.query_rows(*query)
+
+    def show_fetched(self, page):
+        query, rows = page
+        if query != self.page_query():
+            # A filter or sort was applied meanwhile and reload() has already
+            # drawn the current rows.
+            return
+        self.show(rows)
+
+    def reload(self):
+        self.show(self.app.run_query(*self.page_query()))
+
+    def load_more(self):
+        if self.after is None: return
+        self.show(self.app.run_query(*self.page_query(self.after)), append=True)
+
+    def set_filters(self, filters):
+        self.filters = filters
+        allowed = allowed_sorts(self.spec, filters)
+        if self.sort not in allowed:
+            self.sort = allowed[0]
+            self.show_arrows()
+        self.reload()
+
+    def sort_by(self, col):
+        if col not in allowed_sorts(self.spec, self.filters): return
+        if self.sort == col:
+            self.desc = not self.desc
+        else:
+            self.sort, self.desc = col, False
+        self.show_arrows()
+        self.reload()
+
+    def show_arrows(self):
+        for c in self.columns:
+            arrow = (" \u25bc" if self.desc else " \u25b2") if c == self.sort else ""
+            self.tree.heading(c, text=c + arrow)
+
+    def show(self, rows, append=False):
+        if not append:
+            for i in self.tree.get_children(): self.tree.delete(i)
+            self.after = None
+        if rows is None: return
+        more = len(rows) > self.PAGE_SIZE
+        rows = rows[:self.PAGE_SIZE]
+        for r in rows:
+            self.tree.insert('', 'end', values=self.format_row(r[:-2]))
+        if rows:
+            self.after = tuple(rows[-1][-2:])
+        self.btn_more.configure(state='normal' if more else 'disabled')
+        shown = len(self.tree.get_children())
+        self.lbl_count.configure(text=f"{shown} rows shown" + (", more available" if more else ""))
+
 class SchoolDBApp:
     def __init__(self, root):
         self.root = root
-        self.root.title("School Management Pro")
+        self.root.title(f"School Management Pro - {tenants.active_school()}")
         self.root.geometry("1100x750")
         
         ModernTheme.apply(root)
+        self.roster = Roster()
+        # Start from last run's roster on disk; the "roster" fetch below then
+        # checks it against the database and only reloads if it changed.
+        self.roster_file = os.path.join(CACHE_DIR, f"roster-{tenants.active_school()}.bin")
+        self.roster_mark = self.roster.load_file(self.roster_file)
         
         header_frame = tk.Frame(root, bg=ModernTheme.HEADER_BG, height=60)
         header_frame.pack(fill='x')
@@ -160,6 +206,7 @@ class SchoolDBApp:
         self.tab_marks = ttk.Frame(self.notebook)
         self.tab_attendance = ttk.Frame(self.notebook)
         self.tab_fees = ttk.Frame(self.notebook)
+        self.tab_rankings = ttk.Frame(self.notebook)
         
         self.notebook.add(self.tab_dashboard, text=' Dashboard ')
         self.notebook.add(self.tab_students, text=' Students ')
@@ -167,6 +214,7 @@ class SchoolDBApp:
         self.notebook.add(self.tab_marks, text=' Marks ')
         self.notebook.add(self.tab_attendance, text=' Attendance ')
         self.notebook.add(self.tab_fees, text=' Fees ')
+        self.notebook.add(self.tab_rankings, text=' Rankings ')
         
         self.setup_dashboard()
         self.setup_students()
@@ -174,27 +222,178 @@ class SchoolDBApp:
         self.setup_marks()
         self.setup_attendance()
         self.setup_fees()
+        self.setup_rankings()
         
-        self.refresh_dashboard()
+        # Tabs fetch their data on a worker thread and draw it the first time
+        # they are shown, so the window is usable before any query finishes.
+        self.fetchers = {
+            "dashboard": lambda: self.query_rows(DASHBOARD_QUERY),
+            "trends": self.fetch_trends,
+            "roster": self.fetch_roster,
+            "students": self.list_students.fetch_page,
+            "teachers": self.list_teachers.fetch_page,
+            "marks": self.list_marks.fetch_page,
+            "fees": self.list_fees.fetch_page,
+            "exams": lambda: transaction(rankings.exam_types),
+        }
+        self.tab_views = {
+            str(self.tab_dashboard): (("dashboard", "trends"), self.show_overview),
+            str(self.tab_students): (("roster", "students"), lambda roster, page: self.list_students.show_fetched(page)),
+            str(self.tab_teachers): (("teachers",), self.list_teachers.show_fetched),
+            str(self.tab_marks): (("marks",), self.list_marks.show_fetched),
+            str(self.tab_attendance): (("roster",), lambda roster: None),
+            str(self.tab_fees): (("fees",), self.list_fees.show_fetched),
+            str(self.tab_rankings): (("roster", "exams"), lambda roster, exams: self.show_rank_choices(exams)),
+        }
+        self.fetched = {}
+        self.requested = set()
+        self.rendered = set()
+        if self.roster_mark is not None:
+            self.fetched["roster"] = self.roster
+            diag(f"roster loaded from cache ({len(self.roster)} students)")
+        self.prefetch_done = False
+        self.last_error = None
+        self.request_lock = threading.Lock()
+        self.results = queue.Queue()
+        
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        threading.Thread(target=self.prefetch, daemon=True).start()
+        self.root.after(20, self.poll_results)
+        self.root.after_idle(lambda: diag("time-to-interactive"))
+
+    def request(self, key, background=True):
+        with self.request_lock:
+            if key in self.requested:
+                return
+            self.requested.add(key)
+        if background:
+            threading.Thread(target=self.fetch, args=(key,), daemon=True).start()
+        else:
+            self.fetch(key)
+
+    def fetch(self, key):
+        try:
+            self.results.put((key, self.fetchers[key](), None))
+        except Exception as e:
+            self.results.put((key, None, e))
+
+    def prefetch(self):
+        # The first fetch creates the school's tables and opens its pool
+        # (tenants.connect), so the window is already up from the cached
+        # roster while that happens.
+        for key in PREFETCH_ORDER:
+            self.request(key, background=False)
+
+    def poll_results(self):
+        while True:
+            try:
+                key, data, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if error is not None:
+                # Forget the request so visiting the tab again retries it.
+                with self.request_lock:
+                    self.requested.discard(key)
+                # An unreachable database fails every fetch; say so once.
+                if str(error) != self.last_error:
+                    self.last_error = str(error)
+                    messagebox.showerror("Database Error", str(error))
+                continue
+            self.last_error = None
+            if key == "roster":
+                seen, edits, fresh = data
+                if self.roster is not seen or self.roster.edits != edits:
+                    # Reloaded or edited while this fetch ran, so the fetched
+                    # copy may predate that change; check again.
+                    with self.request_lock:
+                        self.requested.discard("roster")
+                    self.request("roster")
+                    continue
+                if fresh is not None:
+                    self.roster, self.roster_mark = fresh
+                    self.roster_changed()
+                data = self.roster
+            self.fetched[key] = data
+            diag(f"{key} fetched")
+            self.render_current_tab()
+        if len(self.fetched) == len(self.fetchers) and not self.prefetch_done:
+            self.prefetch_done = True
+            diag("prefetch complete")
+        self.root.after(250 if self.prefetch_done else 20, self.poll_results)
+
+    def on_tab_changed(self, event=None):
+        keys, _ = self.tab_views[self.notebook.select()]
+        for key in keys:
+            if key not in self.fetched:
+                self.request(key)
+        self.render_current_tab()
+
+    def render_current_tab(self):
+        tab = self.notebook.select()
+        if tab in self.rendered:
+            return
+        keys, render = self.tab_views[tab]
+        if all(k in self.fetched for k in keys):
+            self.rendered.add(tab)
+            render(*[self.fetched[k] for k in keys])
+            diag(f"{self.notebook.tab(tab, 'text').strip()} tab shown")
 
-    def run_query(self, query, params=(), fetch=True, commit=False):
+    def load_roster(self, cursor, mark=None):
+        # None when the tables still match `mark`, else (roster, new mark).
+        current = watermark(cursor)
+        if mark is not None and current == mark:
+            return None
+        roster = Roster().load(cursor)
         try:
-            conn = get_connection("school")
-            cursor = conn.cursor()
+            roster.save_file(self.roster_file, current)
+        except OSError:
+            pass
+        return roster, current
+
+    def fetch_roster(self):
+        seen, edits, mark = self.roster, self.roster.edits, self.roster_mark
+        return seen, edits, transaction(lambda cursor: self.load_roster(cursor, mark))
+
+    def roster_changed(self):
+        # Redraw what was drawn from the cached copy.
+        if str(self.tab_students) in self.rendered:
+            self.list_students.reload()
+
+    def ensure_roster(self):
+        if "roster" not in self.fetched:
+            self.reload_roster()
+
+    def query_rows(self, query, params=()):
+        def work(cursor):
             cursor.execute(query, params)
-            
-            result = None
-            if fetch:
-                result = cursor.fetchall()
-            if commit:
-                conn.commit()
-                
-            conn.close()
-            return result
+            return cursor.fetchall()
+        return transaction(work)
+
+    def run_query(self, query, params=()):
+        # query_rows for the Tk thread: errors go to a message box.
+        try:
+            return self.query_rows(query, params)
         except Exception as e:
             messagebox.showerror("Database Error", str(e))
             return None
 
+    def run_transaction(self, work, action=None):
+        # `action` names a user action; its round trips go to the diag log.
+        try:
+            result = transaction(work)
+        except Exception as e:
+            messagebox.showerror("Database Error", str(e))
+            return None
+        if action:
+            diag(f"{action} ({last_round_trips()} round trips)")
+        return result
+
+    def reload_roster(self):
+        result = self.run_transaction(self.load_roster)
+        if result is not None:
+            self.roster, self.roster_mark = result
+            self.fetched["roster"] = self.roster
+
     def setup_dashboard(self):
         self.dash_frame = ttk.Frame(self.tab_dashboard, padding=20)
         self.dash_frame.pack(fill='both', expand=True)
@@ -210,6 +409,49 @@ class SchoolDBApp:
         
         ttk.Separator(self.dash_frame, orient='horizontal').pack(fill='x', pady=30)
         ttk.Button(self.dash_frame, text="Refresh Dashboard", command=self.refresh_dashboard).pack(anchor='w')
+        self.setup_trends()
+
+    def setup_trends(self):
+        ttk.Label(self.dash_frame, text="Attendance Trends", style="Header.TLabel").pack(anchor='w', pady=(20, 10))
+        ctrl = ttk.Frame(self.dash_frame)
+        ctrl.pack(fill='x')
+        today = date.today()
+        start = date(today.year - 1 if today.month <= 6 else today.year, (today.month - 7) % 12 + 1, 1)
+        self.trend_params = (start, today, None, False)
+        ttk.Label(ctrl, text="From:").pack(side='left')
+        ent_from = ttk.Entry(ctrl, width=12)
+        ent_from.insert(0, str(start))
+        ent_from.pack(side='left', padx=5)
+        ttk.Label(ctrl, text="To:").pack(side='left')
+        ent_to = ttk.Entry(ctrl, width=12)
+        ent_to.insert(0, str(today))
+        ent_to.pack(side='left', padx=5)
+        ttk.Label(ctrl, text="Class:").pack(side='left')
+        cbo_class = ttk.Combobox(ctrl, state='readonly', width=18)
+        cbo_class.configure(postcommand=lambda: cbo_class.configure(values=["All"] + list(self.roster.class_choices())))
+        cbo_class.set("All")
+        cbo_class.pack(side='left', padx=5)
+        var_daily = tk.BooleanVar()
+        ttk.Checkbutton(ctrl, text="Daily", variable=var_daily).pack(side='left', padx=5)
+
+        def show():
+            self.trend_params = (ent_from.get(), ent_to.get(), self.roster.class_choices().get(cbo_class.get()), var_daily.get())
+            self.show_trends(self.run_transaction(lambda cur: rollups.trends(cur, *self.trend_params)))
+        ttk.Button(ctrl, text="Show", command=show).pack(side='left', padx=5)
+
+        cols = ('Period', 'Present', 'Absent', 'Rate', 'Trend')
+        self.tree_trends = ttk.Treeview(self.dash_frame, columns=cols, show='headings', height=8)
+        for c in cols: self.tree_trends.heading(c, text=c)
+        self.tree_trends.column('Trend', width=260)
+        self.tree_trends.pack(fill='both', expand=True, pady=10)
+
+    def fetch_trends(self):
+        return transaction(lambda cur: rollups.trends(cur, *self.trend_params))
+
+    def show_trends(self, rows):
+        for i in self.tree_trends.get_children(): self.tree_trends.delete(i)
+        for period, present, absent, rate in rows or []:
+            self.tree_trends.insert('', 'end', values=(period, present, absent, f"{rate}%", "\u2588" * int(rate / 4)))
 
     def create_card(self, parent, title, value, col):
         frame = tk.Frame(parent, bg="white", highlightbackground="#ccc", highlightthickness=1, padx=20, pady=20)
@@ -222,41 +464,66 @@ class SchoolDBApp:
         return val_lbl
 
     def refresh_dashboard(self):
-        res = self.run_query("SELECT COUNT(*) FROM students")
-        if res: self.card_student.config(text=str(res[0][0]))
-        res = self.run_query("SELECT COUNT(*) FROM teachers")
-        if res: self.card_teacher.config(text=str(res[0][0]))
-        res = self.run_query("SELECT COUNT(*) FROM classes")
-        if res: self.card_classes.config(text=str(res[0][0]))
+        self.show_dashboard(self.run_query(DASHBOARD_QUERY))
+
+    def show_overview(self, counts, trends):
+        self.show_dashboard(counts)
+        self.show_trends(trends)
+
+    def show_dashboard(self, rows):
+        if not rows: return
+        students, teachers, classes = rows[0]
+        self.card_student.config(text=str(students))
+        self.card_teacher.config(text=str(teachers))
+        self.card_classes.config(text=str(classes))
+
+    def add_filter_bar(self, parent, fields, on_apply):
+        # fields: (label, filter name, choices) where choices returns a
+        # {label: value} dict, or None for a checkbox filter.
+        bar = ttk.Frame(parent, padding=(10, 0))
+        bar.pack(fill='x')
+        getters = {}
+        for label, name, choices in fields:
+            if choices is None:
+                var = tk.BooleanVar()
+                ttk.Checkbutton(bar, text=label, variable=var).pack(side='left', padx=5)
+                getters[name] = var.get
+                continue
+            ttk.Label(bar, text=f"{label}:").pack(side='left')
+            cbo = ttk.Combobox(bar, state='readonly', width=16)
+            cbo.configure(postcommand=lambda c=cbo, ch=choices: c.configure(values=["All"] + list(ch())))
+            cbo.set("All")
+            cbo.pack(side='left', padx=5)
+            getters[name] = lambda c=cbo, ch=choices: ch().get(c.get())
+        ttk.Button(bar, text="Apply Filter", command=lambda: on_apply({n: get() for n, get in getters.items()})).pack(side='left', padx=5)
+
+    def class_filter(self):
+        return ("Class", "class", lambda: self.roster.class_choices())
 
     def setup_students(self):
         controls = ttk.Frame(self.tab_students, padding=10)
         controls.pack(fill='x')
         ttk.Button(controls, text="Add New Student", command=self.add_student_dialog).pack(side='left')
         ttk.Button(controls, text="Delete Selected", command=self.delete_student).pack(side='right')
+        ttk.Button(controls, text="Refresh", command=self.refresh_students).pack(side='left', padx=5)
+        self.add_filter_bar(self.tab_students, [
+            self.class_filter(),
+            ("Gender", "gender", lambda: {g: g for g in GENDERS if g}),
+        ], lambda f: self.list_students.set_filters(f))
         
+        def format_row(r):
+            cls_name, section, stream, _ = self.roster.class_info(r[3])
+            return [x if x is not None else "-" for x in (r[0], r[1], r[2], cls_name, section, stream)]
         cols = ('ID', 'Name', 'Gender', 'Class', 'Section', 'Stream')
-        self.tree_students = ttk.Treeview(self.tab_students, columns=cols, show='headings')
-        for col in cols:
-            self.tree_students.heading(col, text=col)
-            self.tree_students.column(col, width=100)
-            
-        self.tree_students.pack(fill='both', expand=True, padx=10, pady=10)
-        self.load_students()
+        self.list_students = ServerList(self, self.tab_students, STUDENTS_LIST, cols, format_row, width=100)
+        self.tree_students = self.list_students.tree
         
     def load_students(self):
-        for item in self.tree_students.get_children():
-            self.tree_students.delete(item)
-        rows = self.run_query("""
-            SELECT s.student_id, s.name, s.gender, c.class_name, c.section, c.stream 
-            FROM students s 
-            LEFT JOIN classes c ON s.class_id = c.class_id
-            ORDER BY s.student_id
-        """)
-        if rows:
-            for r in rows:
-                vals = [x if x is not None else "-" for x in r]
-                self.tree_students.insert('', 'end', values=vals)
+        self.list_students.reload()
+
+    def refresh_students(self):
+        self.reload_roster()
+        self.load_students()
 
     def add_student_dialog(self):
         win = tk.Toplevel(self.root)
@@ -276,13 +543,9 @@ class SchoolDBApp:
         cbo_class = ttk.Combobox(win)
         cbo_class.pack(pady=5)
         
-        classes = self.run_query("SELECT class_id, class_name, section, stream FROM classes")
-        cls_map = {}
-        if classes:
-            for c in classes:
-                lbl = f"{c[1]} {c[2] or ''} ({c[3] or 'Gen'})"
-                cls_map[lbl] = c[0]
-            cbo_class['values'] = list(cls_map.keys())
+        self.ensure_roster()
+        cls_map = self.roster.class_choices()
+        cbo_class['values'] = list(cls_map.keys())
             
         def save():
             name = ent_name.get()
@@ -290,11 +553,9 @@ class SchoolDBApp:
             gender = cbo_gender.get()
             cls = cbo_class.get()
             if not name or not cls: return
-            self.run_query(
-                "INSERT INTO students (name, dob, gender, class_id, admission_date) VALUES (%s, %s, %s, %s, %s)",
-                (name, dob, gender, cls_map[cls], date.today()),
-                commit=True, fetch=False
-            )
+            sid = self.run_transaction(lambda cur: db.insert_student(cur, name, dob, gender, cls_map[cls]), "add student")
+            if sid is None: return
+            self.roster.add_student(sid, name, gender, cls_map[cls])
             self.load_students()
             self.refresh_dashboard()
             win.destroy()
@@ -304,20 +565,13 @@ class SchoolDBApp:
     def delete_student(self):
         sel = self.tree_students.selection()
         if not sel: return
-        sid = self.tree_students.item(sel[0])['values'][0]
-        try:
-            conn = get_connection("school")
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM marks WHERE student_id = %s", (sid,))
-            cursor.execute("DELETE FROM attendance WHERE student_id = %s", (sid,))
-            cursor.execute("DELETE FROM fees WHERE student_id = %s", (sid,))
-            cursor.execute("DELETE FROM students WHERE student_id = %s", (sid,))
-            conn.commit()
-            conn.close()
-            self.load_students()
-            self.refresh_dashboard()
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        sids = [self.tree_students.item(i)['values'][0] for i in sel]
+        if self.run_transaction(lambda cur: db.delete_students(cur, sids), f"delete {len(sids)} students") is None:
+            return
+        for sid in sids:
+            self.roster.remove_student(sid)
+        self.load_students()
+        self.refresh_dashboard()
 
     def setup_teachers(self):
         controls = ttk.Frame(self.tab_teachers, padding=10)
@@ -325,16 +579,11 @@ class SchoolDBApp:
         ttk.Button(controls, text="Add Teacher", command=self.add_teacher_dialog).pack(side='left')
         
         cols = ('ID', 'Name', 'Subject', 'Email')
-        self.tree_teachers = ttk.Treeview(self.tab_teachers, columns=cols, show='headings')
-        for col in cols: self.tree_teachers.heading(col, text=col)
-        self.tree_teachers.pack(fill='both', expand=True, padx=10, pady=10)
-        self.load_teachers()
+        self.list_teachers = ServerList(self, self.tab_teachers, TEACHERS_LIST, cols)
+        self.tree_teachers = self.list_teachers.tree
 
     def load_teachers(self):
-        for i in self.tree_teachers.get_children(): self.tree_teachers.delete(i)
-        rows = self.run_query("SELECT teacher_id, name, subject_specialization, email FROM teachers")
-        if rows:
-            for r in rows: self.tree_teachers.insert('', 'end', values=r)
+        self.list_teachers.reload()
 
     def add_teacher_dialog(self):
         win = tk.Toplevel(self.root)
@@ -349,7 +598,7 @@ class SchoolDBApp:
         def save():
             v = [entries[f].get() for f in fields]
             if not v[0]: return
-            self.run_query("INSERT INTO teachers (name, subject_specialization, email) VALUES (%s, %s, %s)", tuple(v), commit=True, fetch=False)
+            if self.run_transaction(lambda cur: db.insert_teacher(cur, *v), "add teacher") is None: return
             self.load_teachers()
             self.refresh_dashboard()
             win.destroy()
@@ -360,24 +609,17 @@ class SchoolDBApp:
         controls.pack(fill='x')
         ttk.Button(controls, text="Add Marks", command=self.add_marks_dialog).pack(side='left')
         ttk.Button(controls, text="Refresh", command=self.load_marks).pack(side='left', padx=5)
+        self.add_filter_bar(self.tab_marks, [
+            self.class_filter(),
+            ("Subject", "subject", lambda: self.roster.subject_choices()),
+            ("Exam", "exam", lambda: {e: e for e in self.fetched.get("exams") or []}),
+        ], lambda f: self.list_marks.set_filters(f))
         cols = ('Student', 'Class', 'Subject', 'Exam', 'Marks', 'Max')
-        self.tree_marks = ttk.Treeview(self.tab_marks, columns=cols, show='headings')
-        for col in cols: self.tree_marks.heading(col, text=col)
-        self.tree_marks.pack(fill='both', expand=True, padx=10, pady=10)
-        self.load_marks()
+        self.list_marks = ServerList(self, self.tab_marks, MARKS_LIST, cols)
+        self.tree_marks = self.list_marks.tree
 
     def load_marks(self):
-        for i in self.tree_marks.get_children(): self.tree_marks.delete(i)
-        rows = self.run_query("""
-            SELECT s.name, CONCAT(c.class_name, c.section), sub.subject_name, m.exam_type, m.marks_obtained, m.max_marks
-            FROM marks m
-            JOIN students s ON m.student_id = s.student_id
-            JOIN classes c ON s.class_id = c.class_id
-            JOIN subjects sub ON m.subject_id = sub.subject_id
-            ORDER BY m.mark_id DESC LIMIT 100
-        """)
-        if rows:
-            for r in rows: self.tree_marks.insert('', 'end', values=r)
+        self.list_marks.reload()
 
     def add_marks_dialog(self):
         win = tk.Toplevel(self.root)
@@ -386,14 +628,13 @@ class SchoolDBApp:
         ttk.Label(win, text="Select Student").pack(pady=5)
         cbo_student = ttk.Combobox(win)
         cbo_student.pack(pady=5)
-        st_rows = self.run_query("SELECT student_id, name FROM students ORDER BY name")
-        st_map = {f"{r[1]} (ID: {r[0]})": r[0] for r in st_rows or []}
+        self.ensure_roster()
+        st_map = self.roster.student_choices()
         cbo_student['values'] = list(st_map.keys())
         ttk.Label(win, text="Select Subject").pack(pady=5)
         cbo_sub = ttk.Combobox(win)
         cbo_sub.pack(pady=5)
-        sub_rows = self.run_query("SELECT subject_id, subject_name FROM subjects ORDER BY subject_name")
-        sub_map = {r[1]: r[0] for r in sub_rows or []}
+        sub_map = self.roster.subject_choices()
         cbo_sub['values'] = list(sub_map.keys())
         ttk.Label(win, text="Exam Type").pack(pady=5)
         ent_exam = ttk.Entry(win)
@@ -410,7 +651,12 @@ class SchoolDBApp:
             sub_label = cbo_sub.get()
             if not s_label or not sub_label: return
             sid, subid = st_map[s_label], sub_map[sub_label]
-            self.run_query("INSERT INTO marks (student_id, subject_id, exam_type, marks_obtained, max_marks) VALUES (%s, %s, %s, %s, %s)", (sid, subid, ent_exam.get(), ent_obt.get(), ent_max.get()), commit=True, fetch=False)
+            exam, obt, mx = ent_exam.get(), ent_obt.get(), ent_max.get()
+            if self.run_transaction(lambda cur: db.insert_marks(cur, sid, subid, exam, obt, mx), "add marks") is None: return
+            exams = self.fetched.get("exams")
+            if exams is not None and (exam or "") not in exams:
+                self.fetched["exams"] = sorted(exams + [exam or ""])
+                self.show_rank_choices(self.fetched["exams"])
             self.load_marks()
             win.destroy()
         ttk.Button(win, text="Save", command=save).pack(pady=20)
@@ -431,10 +677,10 @@ class SchoolDBApp:
         def load_class_list():
             for w in scroll_frame.winfo_children(): w.destroy()
             status_vars.clear()
-            rows = self.run_query("SELECT s.student_id, s.name, c.class_name FROM students s JOIN classes c ON s.class_id=c.class_id ORDER BY c.class_name, s.name")
-            if not rows: return
-            for i, r in enumerate(rows):
-                sid, name, cl = r
+            self.ensure_roster()
+            for i, r in enumerate(self.roster.students_by_class()):
+                sid, name, _, class_id = r
+                cl = self.roster.class_info(class_id)[0]
                 ttk.Label(scroll_frame, text=f"{cl} - {name}").grid(row=i, column=0, sticky='w', padx=10, pady=2)
                 var = tk.StringVar(value="Present")
                 ttk.Combobox(scroll_frame, textvariable=var, values=["Present", "Absent"], width=8, state='readonly').grid(row=i, column=1, padx=10)
@@ -452,14 +698,8 @@ class SchoolDBApp:
             dt = ent_date.get()
             data = [(sid, dt, var.get()) for sid, var in status_vars.items()]
             if not data: return
-            try:
-                conn = get_connection("school")
-                cursor = conn.cursor()
-                cursor.executemany("INSERT INTO attendance (student_id, date, status) VALUES (%s, %s, %s) ON DUPLICATE KEY UPDATE status=VALUES(status)", data)
-                conn.commit()
-                conn.close()
+            if self.run_transaction(lambda cur: db.upsert_attendance(cur, data), f"mark attendance for {len(data)} students") is not None:
                 messagebox.showinfo("Success", "Attendance Marked")
-            except Exception as e: messagebox.showerror("Error", str(e))
         ttk.Button(ctrl, text="Submit Attendance", command=submit_att).pack(side='right')
         v_ctrl = ttk.Frame(f_view, padding=10)
         v_ctrl.pack(fill='x')
@@ -472,32 +712,28 @@ class SchoolDBApp:
         tree_att.pack(fill='both', expand=True, padx=10, pady=10)
         def load_view():
             for i in tree_att.get_children(): tree_att.delete(i)
-            rows = self.run_query("""
-                SELECT s.name, CONCAT(c.class_name, c.section), COALESCE(a.status, 'N/A')
-                FROM students s JOIN classes c ON s.class_id = c.class_id
-                LEFT JOIN attendance a ON s.student_id = a.student_id AND a.date = %s
-                ORDER BY c.class_name
-            """, (v_ent.get(),))
-            if rows:
-                for r in rows: tree_att.insert('', 'end', values=r)
+            statuses = self.run_transaction(lambda cur: db.fetch_statuses(cur, v_ent.get()))
+            if statuses is None: return
+            self.ensure_roster()
+            for sid, name, _, class_id in self.roster.students_by_class():
+                tree_att.insert('', 'end', values=(name, self.roster.class_label(class_id), statuses.get(sid, 'N/A')))
         ttk.Button(v_ctrl, text="View Report", command=load_view).pack(side='left', padx=5)
 
     def setup_fees(self):
+        self.add_filter_bar(self.tab_fees, [
+            self.class_filter(),
+            ("Dues pending only", "dues", None),
+        ], lambda f: self.list_fees.set_filters(f))
         cols = ('ID', 'Student', 'Total', 'Paid', 'Due', 'Last Payment')
-        self.tree_fees = ttk.Treeview(self.tab_fees, columns=cols, show='headings')
-        for c in cols: self.tree_fees.heading(c, text=c)
-        self.tree_fees.pack(fill='both', expand=True, padx=10, pady=10)
+        self.list_fees = ServerList(self, self.tab_fees, FEES_LIST, cols)
+        self.tree_fees = self.list_fees.tree
         frame_act = ttk.Frame(self.tab_fees, padding=10)
         frame_act.pack(fill='x')
         ttk.Button(frame_act, text="Refresh", command=self.load_fees).pack(side='right')
         ttk.Button(frame_act, text="Update Payment", command=self.update_fee_dialog).pack(side='right', padx=5)
-        self.load_fees()
 
     def load_fees(self):
-        for i in self.tree_fees.get_children(): self.tree_fees.delete(i)
-        rows = self.run_query("SELECT f.fee_id, s.name, f.total_fee, f.paid_fee, f.due_fee, f.last_payment_date FROM fees f JOIN students s ON f.student_id = s.student_id")
-        if rows:
-            for r in rows: self.tree_fees.insert('', 'end', values=r)
+        self.list_fees.reload()
 
     def update_fee_dialog(self):
         sel = self.tree_fees.selection()
@@ -513,20 +749,72 @@ class SchoolDBApp:
         ent_pay.pack(pady=5)
         def save():
             amt = int(ent_pay.get())
-            new_paid = paid + amt
-            self.run_query("UPDATE fees SET paid_fee=%s, due_fee=%s, last_payment_date=%s WHERE fee_id=%s", (new_paid, total - new_paid, date.today(), fee_id), commit=True, fetch=False)
+            if self.run_transaction(lambda cur: db.pay_fee(cur, fee_id, amt), "update fees") is None: return
             self.load_fees()
             win.destroy()
         ttk.Button(win, text="Process Payment", command=save).pack(pady=15)
 
+    def setup_rankings(self):
+        controls = ttk.Frame(self.tab_rankings, padding=10)
+        controls.pack(fill='x')
+        ttk.Label(controls, text="Class:").pack(side='left')
+        cbo_class = ttk.Combobox(controls, state='readonly', width=18)
+        cbo_class.pack(side='left', padx=5)
+        ttk.Label(controls, text="Exam:").pack(side='left')
+        cbo_exam = ttk.Combobox(controls, state='readonly', width=14)
+        cbo_exam.pack(side='left', padx=5)
+        ttk.Label(controls, text="Top:").pack(side='left')
+        spn_top = ttk.Spinbox(controls, from_=1, to=500, width=5)
+        spn_top.set(10)
+        spn_top.pack(side='left', padx=5)
+        cls_map = {}
+
+        def show_choices(exams):
+            cls_map.clear()
+            cls_map.update(self.roster.class_choices())
+            cbo_class['values'] = list(cls_map.keys())
+            cbo_exam['values'] = exams or []
+        self.show_rank_choices = show_choices
+
+        def load_choices():
+            exams = self.run_transaction(rankings.exam_types)
+            if exams is None: return
+            self.fetched["exams"] = exams
+            show_choices(exams)
+
+        def show():
+            if cbo_class.get() not in cls_map or not cbo_exam.get(): return
+            for i in tree.get_children(): tree.delete(i)
+            rows = self.run_transaction(lambda cur: rankings.top(cur, cls_map[cbo_class.get()], cbo_exam.get(), int(spn_top.get())))
+            for r in rows or []:
+                tree.insert('', 'end', values=(r[0], r[2], r[3], r[4], r[5], f"{r[6]}%"))
+
+        def rebuild():
+            n = self.run_transaction(rankings.rebuild)
+            if n is not None:
+                messagebox.showinfo("Rankings", f"Rebuilt {n} ranking rows from marks")
+                load_choices()
+                show()
+
+        ttk.Button(controls, text="Show", command=show).pack(side='left', padx=5)
+        ttk.Button(controls, text="Reload Lists", command=load_choices).pack(side='left')
+        ttk.Button(controls, text="Rebuild Rankings", command=rebuild).pack(side='right')
+        cols = ('Rank', 'Student', 'Total', 'Max', 'Subjects', 'Percent')
+        tree = ttk.Treeview(self.tab_rankings, columns=cols, show='headings')
+        for c in cols: tree.heading(c, text=c)
+        tree.pack(fill='both', expand=True, padx=10, pady=10)
+
 if __name__ == "__main__":
-    if not os.path.exists(VENV_DIR):
-        create_venv()
-        install_deps()
-        rerun_in_venv()
-    if not in_venv(): rerun_in_venv()
+    ensure_venv()
     if tk is None: sys.exit(1)
-    setup_database()
+    parser = argparse.ArgumentParser(description="School Management System (window version).")
+    parser.add_argument("--school", help="school id from tenants.json (default $SCHOOL_ID or main)")
+    args = parser.parse_args()
+    try:
+        tenants.set_active_school(args.school or tenants.active_school())
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
     root = tk.Tk()
     app = SchoolDBApp(root)
     root.mainloop()
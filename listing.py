@@ -0,0 +1,103 @@
+# Turns the sort column, filters and "load more" position of a list tab into a
+# parameterized query, so sorting and filtering happen in MySQL on an index and
+# only one page of rows ever crosses the wire. Paging is keyset based (continue
+# after the last row shown) rather than OFFSET, so page 500 costs the same as
+# page 1.
+
+# Indexes backing the sortable columns and filters of the list tabs: one per
+# (filters, sort) combination the tabs offer, with the equality filters first,
+# then the sort column, then the key. The foreign key indexes on class_id and
+# subject_id cover "filter, sort by ID". Filters that go through a join (a
+# class on the Marks and Fees tabs) use a join order hint instead, so they
+# cost the size of one class rather than the whole table.
+LIST_INDEXES = {
+    "idx_students_name": ("students", "name"),
+    "idx_students_gender": ("students", "gender"),
+    "idx_students_gender_name": ("students", "gender, name, student_id"),
+    "idx_students_class_name": ("students", "class_id, name, student_id"),
+    "idx_students_class_gender": ("students", "class_id, gender, student_id"),
+    "idx_students_class_gender_name": ("students", "class_id, gender, name, student_id"),
+    "idx_teachers_name": ("teachers", "name"),
+    "idx_teachers_subject": ("teachers", "subject_specialization"),
+    "idx_marks_exam": ("marks", "exam_type"),
+    "idx_marks_obtained": ("marks", "marks_obtained"),
+    "idx_marks_exam_obtained": ("marks", "exam_type, marks_obtained, mark_id"),
+    "idx_marks_subject_exam": ("marks", "subject_id, exam_type, mark_id"),
+    "idx_marks_subject_obtained": ("marks", "subject_id, marks_obtained, mark_id"),
+    "idx_marks_subject_exam_obtained": ("marks", "subject_id, exam_type, marks_obtained, mark_id"),
+    "idx_fees_due": ("fees", "due_fee"),
+    "idx_fees_paid": ("fees", "paid_fee"),
+    "idx_fees_last_payment": ("fees", "last_payment_date"),
+}
+
+def ensure_indexes(cursor):
+    cursor.execute("SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE()")
+    existing = {r[0] for r in cursor.fetchall()}
+    for name, (table, columns) in LIST_INDEXES.items():
+        if name not in existing:
+            cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+class ListSpec:
+    # filter_sorts: filter -> the sorts an index can serve while it is on (None
+    # is the key). hints: filter -> optimizer hint to add while it is on.
+    def __init__(self, select, source, key, sorts, filters=None, default_sort=None, default_desc=False,
+                 filter_sorts=None, hints=None):
+        self.select = select
+        self.source = source
+        self.key = key
+        self.sorts = sorts
+        self.filters = filters or {}
+        self.default_sort = default_sort
+        self.default_desc = default_desc
+        self.filter_sorts = filter_sorts or {}
+        self.hints = hints or {}
+
+    def sort_expr(self, sort):
+        return self.sorts[sort] if sort else self.key
+
+def is_active(value):
+    return not (value is None or value == "" or value is False)
+
+def allowed_sorts(spec, filters):
+    allowed = [None] + list(spec.sorts)
+    for name, value in filters.items():
+        if is_active(value) and name in spec.filter_sorts:
+            allowed = [s for s in allowed if s in spec.filter_sorts[name]]
+    return allowed
+
+def keyset_condition(expr, key, desc, after):
+    # NULLs sort first ascending and last descending in MySQL.
+    value, last_key = after
+    if not desc:
+        if value is None:
+            return f"(({expr} IS NULL AND {key} > %s) OR {expr} IS NOT NULL)", [last_key]
+        return f"({expr} > %s OR ({expr} = %s AND {key} > %s))", [value, value, last_key]
+    if value is None:
+        return f"({expr} IS NULL AND {key} < %s)", [last_key]
+    return f"({expr} < %s OR ({expr} = %s AND {key} < %s) OR {expr} IS NULL)", [value, value, last_key]
+
+def build_query(spec, filters, sort=None, desc=False, after=None, limit=200):
+    # The sort value and key are selected as the last two columns so the
+    # caller can pass them back as `after` to get the next page.
+    where, params, hints = [], [], []
+    for name, value in filters.items():
+        if not is_active(value):
+            continue
+        if name in spec.hints:
+            hints.append(spec.hints[name])
+        cond = spec.filters[name]
+        where.append(cond)
+        params.extend([value] * cond.count("%s"))
+    expr = spec.sort_expr(sort)
+    if after is not None:
+        cond, extra = keyset_condition(expr, spec.key, desc, after)
+        where.append(cond)
+        params.extend(extra)
+    hint = f"/*+ {' '.join(hints)} */ " if hints else ""
+    query = f"SELECT {hint}{spec.select}, {expr}, {spec.key} {spec.source}"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    direction = "DESC" if desc else "ASC"
+    query += f" ORDER BY {expr} {direction}, {spec.key} {direction} LIMIT %s"
+    params.append(limit)
+    return query, params
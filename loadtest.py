@@ -0,0 +1,209 @@
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from bootstrap import ensure_venv
+from db import get_connection, setup_database, upsert_attendance, insert_marks
+from db import pay_fee as db_pay_fee
+
+# Simulates several clerks hitting the same database at once with the writes
+# the front ends actually do: class attendance upserts, fee payments and marks
+# entry. Run it against a scratch database, never the real "school" one.
+
+DEADLOCK = 1213
+LOCK_WAIT_TIMEOUT = 1205
+
+OPERATIONS = ("attendance", "fees", "marks")
+
+def seed(db_name, n_students, n_classes):
+    conn = get_connection(db_name)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM students")
+    if cursor.fetchone()[0] >= n_students:
+        conn.close()
+        return
+    rng = random.Random(1)
+    cursor.execute("INSERT INTO teachers (name, subject_specialization, email) VALUES ('Load Test', 'All', NULL)")
+    teacher_id = cursor.lastrowid
+    cursor.executemany("INSERT INTO subjects (subject_name, teacher_id) VALUES (%s, %s)",
+                       [(f"Subject {i}", teacher_id) for i in range(1, 9)])
+    cursor.executemany("INSERT INTO classes (class_name, section, stream) VALUES (%s, %s, %s)",
+                       [(str(6 + i % 7), "ABCD"[i % 4], None) for i in range(n_classes)])
+    cursor.execute("SELECT class_id FROM classes")
+    class_ids = [r[0] for r in cursor.fetchall()]
+    students = [(f"Student {i}", "2010-01-01", rng.choice(["Male", "Female"]), rng.choice(class_ids), date.today())
+                for i in range(n_students)]
+    for i in range(0, len(students), 1000):
+        cursor.executemany("INSERT INTO students (name, dob, gender, class_id, admission_date) VALUES (%s, %s, %s, %s, %s)",
+                           students[i:i + 1000])
+    cursor.execute("""
+    INSERT INTO fees (student_id, total_fee, paid_fee, due_fee, last_payment_date)
+    SELECT student_id, 50000, 0, 50000, NULL FROM students
+    WHERE student_id NOT IN (SELECT student_id FROM fees WHERE student_id IS NOT NULL)
+    """)
+    conn.commit()
+    conn.close()
+
+def load_ids(db_name):
+    conn = get_connection(db_name)
+    cursor = conn.cursor()
+    cursor.execute("SELECT student_id, class_id FROM students")
+    by_class = {}
+    for sid, cid in cursor.fetchall():
+        by_class.setdefault(cid, []).append(sid)
+    cursor.execute("SELECT fee_id FROM fees")
+    fee_ids = [r[0] for r in cursor.fetchall()]
+    cursor.execute("SELECT subject_id FROM subjects")
+    subject_ids = [r[0] for r in cursor.fetchall()]
+    conn.close()
+    return {"by_class": by_class, "fee_ids": fee_ids, "subject_ids": subject_ids}
+
+def pay_fee(cursor, fee_id, amount, racy):
+    if not racy:
+        db_pay_fee(cursor, fee_id, amount)
+        return
+    # --racy-fees: what update_fee_dialog used to do, read the row, add in
+    # Python and write it back, to compare against the atomic update.
+    cursor.execute("SELECT total_fee, paid_fee FROM fees WHERE fee_id = %s", (fee_id,))
+    total, paid = cursor.fetchone()
+    new_paid = paid + amount
+    cursor.execute("UPDATE fees SET paid_fee=%s, due_fee=%s, last_payment_date=%s WHERE fee_id=%s",
+                   (new_paid, total - new_paid, date.today(), fee_id))
+
+def run_clerk(clerk_id, db_name, duration, mix, racy_fees, ids, hot_days):
+    from mysql.connector import Error
+    rng = random.Random(clerk_id)
+    ops, weights = zip(*mix.items())
+    classes = list(ids["by_class"].items())
+    stats = {"latencies": {op: [] for op in OPERATIONS}, "deadlocks": 0, "timeouts": 0, "errors": 0, "paid": 0}
+    conn = get_connection(db_name)
+    cursor = conn.cursor()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        op = rng.choices(ops, weights)[0]
+        start = time.perf_counter()
+        amount = 0
+        try:
+            if op == "attendance":
+                class_id, student_ids = rng.choice(classes)
+                day = date.today() - timedelta(days=rng.randrange(hot_days))
+                upsert_attendance(cursor, [(sid, day, rng.choice(["Present", "Present", "Present", "Absent"])) for sid in student_ids])
+            elif op == "fees":
+                amount = rng.randrange(100, 2000)
+                pay_fee(cursor, rng.choice(ids["fee_ids"]), amount, racy_fees)
+            else:
+                class_id, student_ids = rng.choice(classes)
+                insert_marks(cursor, rng.choice(student_ids), rng.choice(ids["subject_ids"]),
+                             rng.choice(["Midterm", "Final"]), rng.randrange(30, 100), 100)
+            conn.commit()
+            stats["latencies"][op].append(time.perf_counter() - start)
+            stats["paid"] += amount
+        except Error as e:
+            conn.rollback()
+            if e.errno == DEADLOCK:
+                stats["deadlocks"] += 1
+            elif e.errno == LOCK_WAIT_TIMEOUT:
+                stats["timeouts"] += 1
+            else:
+                stats["errors"] += 1
+    cursor.close()
+    conn.close()
+    return stats
+
+def server_counters(db_name):
+    conn = get_connection(db_name)
+    cursor = conn.cursor()
+    cursor.execute("SHOW GLOBAL STATUS WHERE Variable_name IN ('Innodb_row_lock_waits', 'Innodb_row_lock_time')")
+    counters = {name: int(value) for name, value in cursor.fetchall()}
+    cursor.execute("SELECT COALESCE(SUM(paid_fee), 0) FROM fees")
+    counters["paid_total"] = int(cursor.fetchone()[0])
+    conn.close()
+    return counters
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def run_round(args, clerks, mix, ids):
+    before = server_counters(args.database)
+    pool_cls = ProcessPoolExecutor if args.processes else ThreadPoolExecutor
+    started = time.perf_counter()
+    with pool_cls(max_workers=clerks) as pool:
+        futures = [pool.submit(run_clerk, i, args.database, args.duration, mix, args.racy_fees, ids, args.hot_days)
+                   for i in range(clerks)]
+        results = [f.result() for f in futures]
+    elapsed = time.perf_counter() - started
+    after = server_counters(args.database)
+
+    report = {"clerks": clerks, "seconds": round(elapsed, 2)}
+    total_ops = 0
+    for op in OPERATIONS:
+        lat = [x for r in results for x in r["latencies"][op]]
+        total_ops += len(lat)
+        report[op] = {"ops": len(lat), "p50_ms": round(percentile(lat, 50) * 1000, 2),
+                      "p99_ms": round(percentile(lat, 99) * 1000, 2)}
+    report["throughput"] = round(total_ops / elapsed, 1)
+    report["lock_waits"] = after["Innodb_row_lock_waits"] - before["Innodb_row_lock_waits"]
+    report["lock_wait_ms"] = after["Innodb_row_lock_time"] - before["Innodb_row_lock_time"]
+    report["deadlocks"] = sum(r["deadlocks"] for r in results)
+    report["lock_timeouts"] = sum(r["timeouts"] for r in results)
+    report["errors"] = sum(r["errors"] for r in results)
+    # Every committed payment should show up in SUM(paid_fee); anything missing was overwritten.
+    expected = sum(r["paid"] for r in results)
+    report["lost_update_amount"] = expected - (after["paid_total"] - before["paid_total"])
+    return report
+
+def print_report(report):
+    ops = "  ".join(f"{op} {report[op]['ops']} ops p50 {report[op]['p50_ms']}ms p99 {report[op]['p99_ms']}ms" for op in OPERATIONS)
+    print(f"{report['clerks']:>3} clerks  {report['throughput']:>8} ops/s  {ops}")
+    print(f"            lock waits {report['lock_waits']} ({report['lock_wait_ms']} ms)  deadlocks {report['deadlocks']}"
+          f"  lock timeouts {report['lock_timeouts']}  errors {report['errors']}  lost updates {report['lost_update_amount']}")
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        op, weight = part.split("=")
+        if op not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {op}, expected one of {', '.join(OPERATIONS)}")
+        mix[op] = float(weight)
+    return mix
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Concurrent clerk load test for the write paths")
+    parser.add_argument("--database", default="school_loadtest", help="scratch database to create and hammer")
+    parser.add_argument("--clerks", default="1,2,4,8", help="comma separated clerk counts to run in turn")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per round")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("attendance=2,fees=3,marks=5"))
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--classes", type=int, default=20)
+    parser.add_argument("--hot-days", type=int, default=5, help="attendance dates are picked from the last N days")
+    parser.add_argument("--racy-fees", action="store_true", help="take fee payments the old read-modify-write way instead of paid_fee = paid_fee + x")
+    parser.add_argument("--processes", action="store_true", help="one process per clerk instead of threads")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.database == "school":
+        parser.error("refusing to load test the live 'school' database")
+    setup_database(args.database)
+    seed(args.database, args.students, args.classes)
+    ids = load_ids(args.database)
+
+    reports = []
+    for clerks in [int(n) for n in args.clerks.split(",")]:
+        report = run_round(args, clerks, args.mix, ids)
+        reports.append(report)
+        if not args.json:
+            print_report(report)
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    ensure_venv()
+    sys.exit(main(sys.argv[1:]))
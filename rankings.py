@@ -0,0 +1,163 @@
+# Per-exam, per-class totals for every student, kept up to date as marks are
+# written so "top 10 in 11A for Midterm" is one index range read instead of a
+# GROUP BY over the whole marks table.
+
+RANKINGS_TABLE = """CREATE TABLE IF NOT EXISTS exam_rankings (
+    exam_type VARCHAR(20) NOT NULL,
+    class_id INT NOT NULL,
+    student_id INT NOT NULL,
+    total_obtained INT NOT NULL DEFAULT 0,
+    total_max INT NOT NULL DEFAULT 0,
+    subjects INT NOT NULL DEFAULT 0,
+    percentage DECIMAL(6,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (exam_type, class_id, student_id),
+    KEY idx_rank (exam_type, class_id, percentage, total_obtained),
+    FOREIGN KEY (student_id) REFERENCES students(student_id),
+    FOREIGN KEY (class_id) REFERENCES classes(class_id)
+)"""
+
+RANKING_COLUMNS = ("rank", "student_id", "name", "total_obtained", "total_max", "subjects", "percentage")
+
+APPLY_QUERY = """
+INSERT INTO exam_rankings (exam_type, class_id, student_id, total_obtained, total_max, subjects, percentage)
+SELECT %s, s.class_id, s.student_id, %s, %s, %s, IF(%s > 0, ROUND(100 * %s / %s, 2), 0)
+FROM students s
+WHERE s.student_id = %s AND s.class_id IS NOT NULL
+ON DUPLICATE KEY UPDATE
+    total_obtained = total_obtained + VALUES(total_obtained),
+    total_max = total_max + VALUES(total_max),
+    subjects = subjects + VALUES(subjects),
+    percentage = IF(total_max > 0, ROUND(100 * total_obtained / total_max, 2), 0)
+"""
+
+# The same update for many (student, exam) totals at once, from a derived
+# table of literal rows.
+APPLY_MANY_QUERY = """
+INSERT INTO exam_rankings (exam_type, class_id, student_id, total_obtained, total_max, subjects, percentage)
+SELECT d.exam_type, s.class_id, s.student_id, d.obtained, d.max_marks, d.n_subjects,
+       IF(d.max_marks > 0, ROUND(100 * d.obtained / d.max_marks, 2), 0)
+FROM ({rows}) d
+JOIN students s ON s.student_id = d.student_id
+WHERE s.class_id IS NOT NULL
+ON DUPLICATE KEY UPDATE
+    total_obtained = exam_rankings.total_obtained + VALUES(total_obtained),
+    total_max = exam_rankings.total_max + VALUES(total_max),
+    subjects = exam_rankings.subjects + VALUES(subjects),
+    percentage = IF(exam_rankings.total_max > 0, ROUND(100 * exam_rankings.total_obtained / exam_rankings.total_max, 2), 0)
+"""
+# In INSERT ... SELECT the update clause also sees the SELECT's columns, so
+# the old values are qualified with exam_rankings and the derived table's
+# count is n_subjects rather than a second `subjects`.
+APPLY_MANY_ROW = "SELECT %s AS student_id, %s AS exam_type, %s AS obtained, %s AS max_marks, %s AS n_subjects"
+APPLY_MANY_CHUNK = 500
+
+AGGREGATE_QUERY = """
+SELECT COALESCE(m.exam_type, '') AS exam_type, s.class_id, m.student_id,
+       SUM(COALESCE(m.marks_obtained, 0)) AS total_obtained,
+       SUM(COALESCE(m.max_marks, 0)) AS total_max,
+       COUNT(*) AS subjects
+FROM marks m
+JOIN students s ON m.student_id = s.student_id
+WHERE s.class_id IS NOT NULL
+GROUP BY COALESCE(m.exam_type, ''), s.class_id, m.student_id
+"""
+
+def ensure_table(cursor):
+    cursor.execute("SHOW TABLES LIKE 'exam_rankings'")
+    exists = cursor.fetchall()
+    cursor.execute(RANKINGS_TABLE)
+    if not exists:
+        rebuild(cursor)
+
+def apply_marks(cursor, student_id, exam_type, obtained, max_marks, subjects=1):
+    obtained = int(obtained or 0)
+    max_marks = int(max_marks or 0)
+    cursor.execute(APPLY_QUERY, (exam_type or "", obtained, max_marks, subjects,
+                                 max_marks, obtained, max_marks, student_id))
+
+def record_marks(cursor, student_id, subject_id, exam_type, obtained, max_marks):
+    cursor.execute(
+        "INSERT INTO marks (student_id, subject_id, exam_type, marks_obtained, max_marks) VALUES (%s, %s, %s, %s, %s)",
+        (student_id, subject_id, exam_type, obtained, max_marks)
+    )
+    mark_id = cursor.lastrowid
+    apply_marks(cursor, student_id, exam_type, obtained, max_marks)
+    return mark_id
+
+def record_marks_many(cursor, rows):
+    # rows: (student_id, subject_id, exam_type, obtained, max_marks). One
+    # multi-row insert, then one rankings update per 500 students.
+    rows = [(int(sid), subid, exam, obtained, max_marks) for sid, subid, exam, obtained, max_marks in rows]
+    if not rows:
+        return 0
+    cursor.executemany(
+        "INSERT INTO marks (student_id, subject_id, exam_type, marks_obtained, max_marks) VALUES (%s, %s, %s, %s, %s)",
+        rows
+    )
+    totals = {}
+    for sid, _, exam, obtained, max_marks in rows:
+        t = totals.setdefault((sid, exam or ""), [0, 0, 0])
+        t[0] += int(obtained or 0)
+        t[1] += int(max_marks or 0)
+        t[2] += 1
+    items = list(totals.items())
+    for i in range(0, len(items), APPLY_MANY_CHUNK):
+        chunk = items[i:i + APPLY_MANY_CHUNK]
+        params = [v for (sid, exam), t in chunk for v in (sid, exam, *t)]
+        cursor.execute(APPLY_MANY_QUERY.format(rows=" UNION ALL ".join([APPLY_MANY_ROW] * len(chunk))), params)
+    return len(rows)
+
+def forget_students(cursor, student_ids):
+    marks = ", ".join(["%s"] * len(student_ids))
+    cursor.execute(f"DELETE FROM exam_rankings WHERE student_id IN ({marks})", list(student_ids))
+
+def rebuild(cursor):
+    cursor.execute("DELETE FROM exam_rankings")
+    cursor.execute(f"""
+    INSERT INTO exam_rankings (exam_type, class_id, student_id, total_obtained, total_max, subjects, percentage)
+    SELECT exam_type, class_id, student_id, total_obtained, total_max, subjects,
+           IF(total_max > 0, ROUND(100 * total_obtained / total_max, 2), 0)
+    FROM ({AGGREGATE_QUERY}) agg
+    """)
+    return cursor.rowcount
+
+def check(cursor):
+    # Rows that differ between the stored table and a fresh aggregate, in either direction.
+    cursor.execute(f"""
+    SELECT COUNT(*) FROM ({AGGREGATE_QUERY}) agg
+    LEFT JOIN exam_rankings r
+      ON r.exam_type = agg.exam_type AND r.class_id = agg.class_id AND r.student_id = agg.student_id
+    WHERE r.student_id IS NULL OR r.total_obtained <> agg.total_obtained
+       OR r.total_max <> agg.total_max OR r.subjects <> agg.subjects
+    """)
+    missing = cursor.fetchone()[0]
+    cursor.execute(f"""
+    SELECT COUNT(*) FROM exam_rankings r
+    LEFT JOIN ({AGGREGATE_QUERY}) agg
+      ON r.exam_type = agg.exam_type AND r.class_id = agg.class_id AND r.student_id = agg.student_id
+    WHERE agg.student_id IS NULL
+    """)
+    return missing + cursor.fetchone()[0]
+
+def top(cursor, class_id, exam_type, limit=10):
+    cursor.execute("""
+    SELECT r.student_id, s.name, r.total_obtained, r.total_max, r.subjects, r.percentage
+    FROM exam_rankings r
+    JOIN students s ON r.student_id = s.student_id
+    WHERE r.exam_type = %s AND r.class_id = %s
+    ORDER BY r.percentage DESC, r.total_obtained DESC
+    LIMIT %s
+    """, (exam_type or "", class_id, limit))
+    ranked = []
+    for i, row in enumerate(cursor.fetchall()):
+        # Students with the same percentage share a rank (1, 2, 2, 4).
+        if ranked and ranked[-1][-1] == row[-1]:
+            rank = ranked[-1][0]
+        else:
+            rank = i + 1
+        ranked.append((rank,) + tuple(row))
+    return ranked
+
+def exam_types(cursor):
+    cursor.execute("SELECT DISTINCT exam_type FROM exam_rankings ORDER BY exam_type")
+    return [r[0] for r in cursor.fetchall()]
@@ -0,0 +1,160 @@
+from datetime import date, timedelta
+
+# Present/absent counts per class per day and per month, updated in the same
+# transaction as the attendance upsert so term-long trend reports read a few
+# hundred rollup rows instead of every attendance row.
+
+DAILY_TABLE = """CREATE TABLE IF NOT EXISTS attendance_daily (
+    class_id INT NOT NULL,
+    date DATE NOT NULL,
+    present INT NOT NULL DEFAULT 0,
+    absent INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (class_id, date),
+    KEY idx_daily_date (date),
+    FOREIGN KEY (class_id) REFERENCES classes(class_id)
+)"""
+
+MONTHLY_TABLE = """CREATE TABLE IF NOT EXISTS attendance_monthly (
+    class_id INT NOT NULL,
+    month DATE NOT NULL,
+    present INT NOT NULL DEFAULT 0,
+    absent INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (class_id, month),
+    KEY idx_monthly_month (month),
+    FOREIGN KEY (class_id) REFERENCES classes(class_id)
+)"""
+
+ATTENDANCE_UPSERT = """
+INSERT INTO attendance (student_id, date, status)
+VALUES (%s, %s, %s)
+ON DUPLICATE KEY UPDATE status = VALUES(status)
+"""
+
+TREND_COLUMNS = ("period", "present", "absent", "rate")
+
+def ensure_tables(cursor):
+    cursor.execute("SHOW TABLES LIKE 'attendance_daily'")
+    exists = cursor.fetchall()
+    cursor.execute(DAILY_TABLE)
+    cursor.execute(MONTHLY_TABLE)
+    if not exists:
+        rebuild(cursor)
+
+def as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+def month_start(day):
+    return day.replace(day=1)
+
+def month_end(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+def add_delta(deltas, class_id, day, status, sign):
+    counts = deltas.setdefault((class_id, day), [0, 0])
+    counts[0 if status == "Present" else 1] += sign
+
+def apply_deltas(cursor, deltas):
+    daily = [(cid, day, p, a) for (cid, day), (p, a) in deltas.items() if p or a]
+    if not daily:
+        return
+    monthly = {}
+    for cid, day, p, a in daily:
+        counts = monthly.setdefault((cid, month_start(day)), [0, 0])
+        counts[0] += p
+        counts[1] += a
+    cursor.executemany("""
+    INSERT INTO attendance_daily (class_id, date, present, absent) VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE present = present + VALUES(present), absent = absent + VALUES(absent)
+    """, daily)
+    cursor.executemany("""
+    INSERT INTO attendance_monthly (class_id, month, present, absent) VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE present = present + VALUES(present), absent = absent + VALUES(absent)
+    """, [(cid, month, p, a) for (cid, month), (p, a) in monthly.items()])
+
+def record_attendance(cursor, rows):
+    # rows: (student_id, date, status). Lock the students' current rows for
+    # each date first so two clerks marking the same class cannot both count
+    # the same change.
+    if not rows:
+        return 0
+    by_date = {}
+    for sid, day, status in rows:
+        by_date.setdefault(as_date(day), {})[int(sid)] = status
+    deltas = {}
+    for day, statuses in by_date.items():
+        ids = sorted(statuses)
+        marks = ", ".join(["%s"] * len(ids))
+        cursor.execute(f"""
+        SELECT s.student_id, s.class_id, a.status
+        FROM students s
+        LEFT JOIN attendance a ON a.student_id = s.student_id AND a.date = %s
+        WHERE s.student_id IN ({marks})
+        ORDER BY s.student_id
+        FOR UPDATE
+        """, [day] + ids)
+        for sid, class_id, old in cursor.fetchall():
+            new = statuses[sid]
+            if class_id is None or old == new:
+                continue
+            if old:
+                add_delta(deltas, class_id, day, old, -1)
+            add_delta(deltas, class_id, day, new, 1)
+    cursor.executemany(ATTENDANCE_UPSERT, [(sid, day, status) for day, st in by_date.items() for sid, status in st.items()])
+    apply_deltas(cursor, deltas)
+    return len(rows)
+
+def forget_students(cursor, student_ids):
+    marks = ", ".join(["%s"] * len(student_ids))
+    cursor.execute(f"""
+    SELECT s.class_id, a.date, a.status FROM attendance a
+    JOIN students s ON a.student_id = s.student_id
+    WHERE a.student_id IN ({marks}) AND s.class_id IS NOT NULL AND a.status IS NOT NULL
+    """, list(student_ids))
+    deltas = {}
+    for class_id, day, status in cursor.fetchall():
+        add_delta(deltas, class_id, day, status, -1)
+    apply_deltas(cursor, deltas)
+
+def rebuild(cursor, start=None, end=None):
+    # Whole months are recomputed, so a range is widened to month boundaries.
+    start = month_start(as_date(start)) if start else date(1000, 1, 1)
+    end = month_end(as_date(end)) if end else date(9999, 12, 31)
+    cursor.execute("DELETE FROM attendance_daily WHERE date BETWEEN %s AND %s", (start, end))
+    cursor.execute("DELETE FROM attendance_monthly WHERE month BETWEEN %s AND %s", (start, end))
+    cursor.execute("""
+    INSERT INTO attendance_daily (class_id, date, present, absent)
+    SELECT s.class_id, a.date, SUM(a.status = 'Present'), SUM(a.status = 'Absent')
+    FROM attendance a
+    JOIN students s ON a.student_id = s.student_id
+    WHERE s.class_id IS NOT NULL AND a.status IS NOT NULL AND a.date BETWEEN %s AND %s
+    GROUP BY s.class_id, a.date
+    """, (start, end))
+    days = cursor.rowcount
+    cursor.execute("""
+    INSERT INTO attendance_monthly (class_id, month, present, absent)
+    SELECT class_id, DATE_SUB(date, INTERVAL DAYOFMONTH(date) - 1 DAY), SUM(present), SUM(absent)
+    FROM attendance_daily
+    WHERE date BETWEEN %s AND %s
+    GROUP BY class_id, DATE_SUB(date, INTERVAL DAYOFMONTH(date) - 1 DAY)
+    """, (start, end))
+    return {"daily_rows": days, "monthly_rows": cursor.rowcount}
+
+def trends(cursor, start, end, class_id=None, daily=False):
+    table, column = ("attendance_daily", "date") if daily else ("attendance_monthly", "month")
+    start, end = as_date(start), as_date(end)
+    if not daily:
+        start = month_start(start)
+    query = f"SELECT {column}, SUM(present), SUM(absent) FROM {table} WHERE {column} BETWEEN %s AND %s"
+    params = [start, end]
+    if class_id:
+        query += " AND class_id = %s"
+        params.append(class_id)
+    query += f" GROUP BY {column} ORDER BY {column}"
+    cursor.execute(query, params)
+    result = []
+    for period, present, absent in cursor.fetchall():
+        present, absent = int(present), int(absent)
+        total = present + absent
+        label = str(period) if daily else period.strftime("%Y-%m")
+        result.append((label, present, absent, round(100 * present / total, 1) if total else 0.0))
+    return result
@@ -0,0 +1,194 @@
+import os
+import sys
+import json
+import mmap
+import struct
+import tempfile
+from array import array
+
+from db import fetch_reference
+
+# One shared copy of the students, classes and subjects for every tab in the
+# GUI. Students are stored column-wise (typed arrays plus one list of names)
+# instead of a tuple per row, and class/section/stream strings are interned so
+# 50k students in the same 40 classes share 40 labels.
+
+# The GUI keeps a copy on disk so the next launch can start from it straight
+# away: a fixed header, a JSON block (watermark, classes, subjects), then the
+# student columns as raw little-endian arrays and one NUL-separated UTF-8 name
+# blob. Reading it is a few memcpys and one split, not 50k row decodes.
+
+SNAPSHOT_MAGIC = b"ROSTER01"
+SNAPSHOT_HEADER = struct.Struct("<8sII")  # magic, JSON bytes, students
+WATERMARK_QUERY = "CHECKSUM TABLE classes, students, subjects"
+
+GENDERS = (None, "Male", "Female", "Other")
+GENDER_CODES = {g: i for i, g in enumerate(GENDERS)}
+
+def intern_or_none(value):
+    return sys.intern(value) if value else None
+
+def watermark(cursor):
+    # Changes whenever a row of a roster table is added, edited or deleted.
+    cursor.execute(WATERMARK_QUERY)
+    return {table.split(".")[-1]: checksum for table, checksum in cursor.fetchall()}
+
+class Roster:
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.student_ids = array('i')
+        self.names = []
+        self.genders = array('b')
+        self.class_ids = array('i')
+        self.positions = {}
+        self.classes = {}
+        self.subjects = {}
+        self.deleted = 0
+        self.edits = 0
+
+    def load(self, cursor):
+        self.load_rows(*fetch_reference(cursor))
+        return self
+
+    def load_rows(self, classes, students, subjects):
+        self.clear()
+        for c in classes:
+            self.set_class(*c)
+        for sid, name, gender, class_id in students:
+            self.add_student(sid, name, gender, class_id)
+        for subid, name in subjects:
+            self.subjects[subid] = name
+        self.edits = 0
+
+    def set_class(self, class_id, class_name, section, stream):
+        label = sys.intern(f"{class_name}{section or ''}")
+        self.classes[class_id] = (intern_or_none(class_name), intern_or_none(section), intern_or_none(stream), label)
+        self.edits += 1
+
+    def add_student(self, student_id, name, gender, class_id):
+        self.positions[student_id] = len(self.student_ids)
+        self.student_ids.append(student_id)
+        self.names.append(name)
+        self.genders.append(GENDER_CODES.get(gender, 0))
+        self.class_ids.append(class_id or 0)
+        self.edits += 1
+
+    def remove_student(self, student_id):
+        # Leave a hole rather than shifting every column; compact once holes pile up.
+        pos = self.positions.pop(student_id, None)
+        if pos is None:
+            return
+        self.student_ids[pos] = -1
+        self.names[pos] = None
+        self.deleted += 1
+        self.edits += 1
+        if self.deleted > 1000 and self.deleted * 4 > len(self.student_ids):
+            self.compact()
+
+    def compact(self):
+        keep = [i for i, sid in enumerate(self.student_ids) if sid != -1]
+        self.student_ids = array('i', (self.student_ids[i] for i in keep))
+        self.names = [self.names[i] for i in keep]
+        self.genders = array('b', (self.genders[i] for i in keep))
+        self.class_ids = array('i', (self.class_ids[i] for i in keep))
+        self.positions = {sid: i for i, sid in enumerate(self.student_ids)}
+        self.deleted = 0
+
+    def save_file(self, path, mark):
+        if self.deleted:
+            self.compact()
+        columns = [array('i', self.student_ids), array('i', self.class_ids), array('b', self.genders)]
+        if sys.byteorder == "big":
+            for col in columns:
+                col.byteswap()
+        meta = json.dumps({
+            "watermark": mark,
+            "classes": [[cid] + list(info[:3]) for cid, info in self.classes.items()],
+            "subjects": list(self.subjects.items()),
+        }).encode()
+        # Pad the JSON with spaces so the int32 columns start 4-byte aligned.
+        meta += b" " * (-(SNAPSHOT_HEADER.size + len(meta)) % 4)
+        folder = os.path.dirname(path) or "."
+        os.makedirs(folder, exist_ok=True)
+        # A temp file of its own, so two saves at once (the background fetch
+        # and a Refresh) each replace the snapshot whole.
+        fd, tmp = tempfile.mkstemp(dir=folder, prefix=os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, len(meta), len(self.student_ids)))
+                f.write(meta)
+                for col in columns:
+                    col.tofile(f)
+                f.write("\0".join(self.names).encode())
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def load_file(self, path):
+        # Returns the watermark the snapshot was saved with, or None (leaving
+        # the roster untouched) when there is no usable snapshot.
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                magic, meta_len, n = SNAPSHOT_HEADER.unpack_from(m)
+                if magic != SNAPSHOT_MAGIC:
+                    return None
+                pos = SNAPSHOT_HEADER.size
+                meta = json.loads(m[pos:pos + meta_len])
+                pos += meta_len
+                columns = []
+                for code in ("i", "i", "b"):
+                    col = array(code)
+                    col.frombytes(m[pos:pos + n * col.itemsize])
+                    pos += n * col.itemsize
+                    columns.append(col)
+                names = m[pos:].decode().split("\0") if n else []
+        except (OSError, ValueError, struct.error):
+            return None
+        if any(len(col) != n for col in columns) or len(names) != n:
+            return None
+        if sys.byteorder == "big":
+            for col in columns:
+                col.byteswap()
+        self.clear()
+        for class_id, class_name, section, stream in meta["classes"]:
+            self.set_class(class_id, class_name, section, stream)
+        self.subjects = {subid: name for subid, name in meta["subjects"]}
+        self.student_ids, self.class_ids, self.genders = columns
+        self.names = names
+        self.positions = dict(zip(self.student_ids, range(n)))
+        self.edits = 0
+        return meta["watermark"]
+
+    def __len__(self):
+        return len(self.positions)
+
+    def class_info(self, class_id):
+        return self.classes.get(class_id, (None, None, None, None))
+
+    def class_label(self, class_id):
+        return self.class_info(class_id)[3]
+
+    def students(self):
+        ids, names, genders, class_ids = self.student_ids, self.names, self.genders, self.class_ids
+        for i in range(len(ids)):
+            if ids[i] != -1:
+                yield ids[i], names[i], GENDERS[genders[i]], class_ids[i]
+
+    def students_by_class(self):
+        # Same order the attendance sheet used to get from ORDER BY class_name, name.
+        rows = [r for r in self.students() if r[3] in self.classes]
+        rows.sort(key=lambda r: (self.classes[r[3]][0], r[1]))
+        return rows
+
+    def class_choices(self):
+        return {f"{c[0]} {c[1] or ''} ({c[2] or 'Gen'})": cid for cid, c in self.classes.items()}
+
+    def student_choices(self):
+        rows = sorted(self.students(), key=lambda r: r[1])
+        return {f"{r[1]} (ID: {r[0]})": r[0] for r in rows}
+
+    def subject_choices(self):
+        return {name: subid for subid, name in sorted(self.subjects.items(), key=lambda s: s[1])}
@@ -0,0 +1,98 @@
+import os
+import re
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Every school (tenant) gets its own database, and optionally its own server.
+# The map lives in tenants.json (or the file named by SCHOOL_TENANTS):
+#
+#   {"main":  {"database": "school"},
+#    "north": {"database": "school_north"},
+#    "south": {"database": "school_south", "host": "10.0.0.12"}}
+#
+# Any of host, port, user and password can be overridden per school. Without
+# the file there is a single school, "main", in the old `school` database.
+# Connections come from one pool per school, and a school's tables are created
+# the first time anything connects to it.
+
+DEFAULT_SCHOOL = "main"
+TENANTS_FILE = os.environ.get("SCHOOL_TENANTS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tenants.json"))
+POOL_SIZE = int(os.environ.get("SCHOOL_POOL_SIZE", "5"))
+SERVER_KEYS = ("host", "port", "user", "password")
+
+active = {"school": os.environ.get("SCHOOL_ID")}
+tenants = None
+pools = {}
+pool_locks = {}
+registry_lock = threading.Lock()
+
+def load_tenants():
+    global tenants
+    if tenants is None:
+        if os.path.exists(TENANTS_FILE):
+            with open(TENANTS_FILE) as f:
+                tenants = json.load(f)
+        else:
+            tenants = {DEFAULT_SCHOOL: {"database": "school"}}
+    return tenants
+
+def school_ids():
+    return list(load_tenants())
+
+def set_active_school(school_id):
+    if school_id not in load_tenants():
+        raise ValueError(f"Unknown school: {school_id} (known: {', '.join(school_ids())})")
+    active["school"] = school_id
+
+def active_school():
+    if active["school"] is None:
+        ids = school_ids()
+        active["school"] = DEFAULT_SCHOOL if DEFAULT_SCHOOL in ids or not ids else ids[0]
+    return active["school"]
+
+def connection_config(base, school_id):
+    tenant = load_tenants().get(school_id)
+    if tenant is None:
+        raise ValueError(f"Unknown school: {school_id}")
+    config = base.copy()
+    config.update({k: v for k, v in tenant.items() if k in SERVER_KEYS})
+    config["database"] = tenant.get("database", f"school_{school_id}")
+    return config
+
+def connect(base, school_id, provision):
+    # provision(database, server_config) creates the schema; it runs once per
+    # school per process, before that school's pool is opened.
+    import mysql.connector
+    from mysql.connector import pooling
+    from mysql.connector.errors import PoolError
+    with registry_lock:
+        lock = pool_locks.setdefault(school_id, threading.Lock())
+    config = connection_config(base, school_id)
+    with lock:
+        pool = pools.get(school_id)
+        if pool is None:
+            server = {k: v for k, v in config.items() if k != "database"}
+            provision(config["database"], server)
+            name = re.sub(r"[^a-zA-Z0-9_]", "_", f"school_{school_id}")[:60]
+            pool = pooling.MySQLConnectionPool(pool_name=name, pool_size=POOL_SIZE, **config)
+            pools[school_id] = pool
+    try:
+        return pool.get_connection()
+    except PoolError:
+        # Every pooled connection is busy; don't make the caller wait.
+        return mysql.connector.connect(**config)
+
+def fan_out(work, ids=None, workers=8):
+    # Runs work(school_id) for every school at once. Returns {school_id: result}
+    # with the exception in place of the result for schools that failed.
+    ids = ids or school_ids()
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(ids)))) as pool:
+        futures = {school_id: pool.submit(work, school_id) for school_id in ids}
+        for school_id, future in futures.items():
+            try:
+                results[school_id] = future.result()
+            except Exception as e:
+                results[school_id] = e
+    return results
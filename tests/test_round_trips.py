@@ -0,0 +1,147 @@
+import os
+import re
+import sys
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import rankings
+
+# Round trips per user action, counted by db.CountingCursor against a stub
+# cursor, so no MySQL server is needed. The batch helpers must cost the same
+# for one student as for a whole class.
+
+class StubCursor:
+    def __init__(self, results=None):
+        # results: [(substring of the query, rows fetchall returns)]
+        self.results = results or []
+        self.rows = []
+        self.statements = []
+        self.rowcount = 0
+        self.lastrowid = 1
+
+    def execute(self, query, params=()):
+        self.statements.append(query)
+        self.rows = next((rows for text, rows in self.results if text in query), [])
+        self.rowcount = len(params) if params else 1
+
+    def executemany(self, query, rows):
+        self.statements.append(query)
+        self.rowcount = len(rows)
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+class StubConnection:
+    def __init__(self, cursor):
+        self.stub = cursor
+        self.commits = 0
+        self.closed = False
+
+    def cursor(self):
+        return self.stub
+
+    def commit(self):
+        self.commits += 1
+
+    def close(self):
+        self.closed = True
+
+def counting(results=None):
+    return db.CountingCursor(StubCursor(results))
+
+def attendance_rows(ids, days=3):
+    # What rollups.forget_students reads back: (class_id, date, status).
+    return [(sid % 4 + 1, date(2025, 7, d + 1), "Present") for sid in ids for d in range(days)]
+
+class CountingCursorTest(unittest.TestCase):
+    def test_batched_insert_is_one_round_trip(self):
+        cursor = counting()
+        cursor.executemany("INSERT INTO t (a, b) VALUES (%s, %s)", [(1, 2), (3, 4), (5, 6)])
+        self.assertEqual(cursor.round_trips, 1)
+
+    def test_other_executemany_is_one_per_row(self):
+        cursor = counting()
+        cursor.executemany("UPDATE t SET a = %s WHERE b = %s", [(1, 2), (3, 4), (5, 6)])
+        self.assertEqual(cursor.round_trips, 3)
+
+class RoundTripTest(unittest.TestCase):
+    def test_delete_students_does_not_grow_with_selection(self):
+        trips = []
+        for ids in ([7], list(range(1, 51))):
+            cursor = counting([("FROM attendance a", attendance_rows(ids))])
+            db.delete_students(cursor, ids)
+            trips.append(cursor.round_trips)
+        # exam_rankings, the rollup read, its two updates, then four deletes.
+        self.assertEqual(trips, [8, 8])
+
+    def test_delete_students_without_attendance(self):
+        cursor = counting()
+        db.delete_students(cursor, list(range(1, 51)))
+        self.assertEqual(cursor.round_trips, 6)
+
+    def test_upsert_attendance_for_a_class(self):
+        ids = list(range(1, 41))
+        cursor = counting([("FOR UPDATE", [(sid, 3, None) for sid in ids])])
+        db.upsert_attendance(cursor, [(sid, date(2025, 7, 1), "Present") for sid in ids])
+        # Lock read, one multi-row upsert, daily and monthly rollups.
+        self.assertEqual(cursor.round_trips, 4)
+
+    def test_insert_marks_many_below_chunk(self):
+        cursor = counting()
+        db.insert_marks_many(cursor, [(sid, 2, "Midterm", 70, 100) for sid in range(1, 41)])
+        self.assertEqual(cursor.round_trips, 2)
+
+    def test_insert_marks_many_above_chunk(self):
+        students = rankings.APPLY_MANY_CHUNK * 2 + 1
+        cursor = counting()
+        db.insert_marks_many(cursor, [(sid, 2, "Midterm", 70, 100) for sid in range(1, students + 1)])
+        # One insert, then one rankings update per chunk of students.
+        self.assertEqual(cursor.round_trips, 1 + 3)
+
+    def test_apply_many_update_names_are_not_ambiguous(self):
+        # MySQL resolves the update clause against the derived table too, so
+        # a bare name it shares with exam_rankings fails with error 1052.
+        update = rankings.APPLY_MANY_QUERY.split("ON DUPLICATE KEY UPDATE")[1]
+        update = re.sub(r"VALUES\(\w+\)|exam_rankings\.\w+|^\s*\w+ =", "", update, flags=re.M)
+        derived = re.findall(r"AS (\w+)", rankings.APPLY_MANY_ROW)
+        self.assertEqual([name for name in derived if re.search(rf"\b{name}\b", update)], [])
+
+    def test_fetch_reference(self):
+        cursor = counting([("UNION ALL", [(1, 3, "10", "A", None), (2, 4, "Asha", "Female", "3"), (3, 2, "Maths", None, None)])])
+        classes, students, subjects = db.fetch_reference(cursor)
+        self.assertEqual(cursor.round_trips, 1)
+        self.assertEqual(students, [(4, "Asha", "Female", 3)])
+
+class TransactionTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = StubConnection(StubCursor())
+        self.saved = db.get_connection
+        db.get_connection = lambda db_name=None, school_id=None: self.conn
+
+    def tearDown(self):
+        db.get_connection = self.saved
+
+    def test_pay_fee_is_one_statement_and_the_commit(self):
+        db.transaction(lambda cursor: db.pay_fee(cursor, 5, 1000), school_id="main")
+        self.assertEqual(db.last_round_trips(), 2)
+        self.assertEqual(self.conn.commits, 1)
+        self.assertTrue(self.conn.closed)
+
+    def test_failed_transaction_is_not_committed(self):
+        def work(cursor):
+            cursor.execute("SELECT 1")
+            raise RuntimeError("boom")
+        with self.assertRaises(RuntimeError):
+            db.transaction(work, school_id="main")
+        self.assertEqual(self.conn.commits, 0)
+        self.assertEqual(db.last_round_trips(), 1)
+        self.assertTrue(self.conn.closed)
+
+if __name__ == "__main__":
+    unittest.main()